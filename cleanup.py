@@ -4,10 +4,78 @@ Cleanup script for Railway deployment
 Removes development files and optimizes for production
 """
 
+import fnmatch
 import os
-import shutil
+import re
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+
+def _compile_patterns(patterns):
+    """Group glob patterns by parent directory into one union regex per directory.
+
+    A trailing '/' restricts the pattern to directories, as with Path.glob.
+    Returns {parent: (any_re, dir_re)}.
+    """
+    grouped = {}
+    for pattern in patterns:
+        dir_only = pattern.endswith('/')
+        parent, _, name = pattern.rstrip('/').rpartition('/')
+        grouped.setdefault(parent, ([], []))[1 if dir_only else 0].append(fnmatch.translate(name))
+    return {
+        parent: tuple(re.compile('|'.join(p)) if p else None for p in (any_pats, dir_pats))
+        for parent, (any_pats, dir_pats) in grouped.items()
+    }
+
+
+def _match_targets(patterns):
+    """Yield (path, is_dir) for each entry matching one of the patterns, one scandir per directory"""
+    for parent, (any_re, dir_re) in _compile_patterns(patterns).items():
+        try:
+            it = os.scandir(parent or '.')
+        except OSError:
+            continue
+        with it:
+            for entry in it:
+                is_dir = entry.is_dir(follow_symlinks=False)
+                if (any_re and any_re.match(entry.name)) or (dir_re and is_dir and dir_re.match(entry.name)):
+                    yield os.path.join(parent, entry.name) if parent else entry.name, is_dir
+
+
+def _collect_tree(path, files, dirs):
+    """Append every file under path to files and its directories to dirs, children first"""
+    with os.scandir(path) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                _collect_tree(entry.path, files, dirs)
+            else:
+                files.append(entry.path)
+    dirs.append(path)
+
+
+def _try_unlink(path):
+    try:
+        os.unlink(path)
+        return None
+    except OSError as e:
+        return path, e
+
+
+def _remove_paths(files_to_delete, dirs_to_delete_bottom_up):
+    """Unlink files in parallel (I/O bound), then remove the emptied directories in order"""
+    errors = []
+    if files_to_delete:
+        workers = min(32, (os.cpu_count() or 1) * 4)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            errors.extend(err for err in executor.map(_try_unlink, files_to_delete) if err)
+    for path in dirs_to_delete_bottom_up:
+        try:
+            os.rmdir(path)
+        except OSError as e:
+            errors.append((path, e))
+    return errors
+
+
 def cleanup_for_deployment():
     """Clean up unnecessary files for deployment"""
     
@@ -61,22 +129,32 @@ def cleanup_for_deployment():
     ]
     
     removed_count = 0
+    targets = []  # (path, is_dir) for reporting
+    files_to_delete = []
+    dirs_to_delete_bottom_up = []
+    
+    for path, is_dir in _match_targets(cleanup_items):
+        if is_dir:
+            try:
+                _collect_tree(path, files_to_delete, dirs_to_delete_bottom_up)
+            except OSError as e:
+                print(f"  ⚠️  Could not remove {path}: {e}")
+                continue
+        else:
+            files_to_delete.append(path)
+        targets.append((path, is_dir))
+    
+    for path, e in _remove_paths(files_to_delete, dirs_to_delete_bottom_up):
+        print(f"  ⚠️  Could not remove {path}: {e}")
     
-    for item in cleanup_items:
-        paths = Path('.').glob(item)
-        for path in paths:
-            if path.exists():
-                try:
-                    if path.is_file():
-                        path.unlink()
-                        print(f"  ❌ Removed file: {path}")
-                        removed_count += 1
-                    elif path.is_dir():
-                        shutil.rmtree(path)
-                        print(f"  🗑️  Removed directory: {path}")
-                        removed_count += 1
-                except Exception as e:
-                    print(f"  ⚠️  Could not remove {path}: {e}")
+    for path, is_dir in targets:
+        if os.path.lexists(path):
+            continue
+        if is_dir:
+            print(f"  🗑️  Removed directory: {path}")
+        else:
+            print(f"  ❌ Removed file: {path}")
+        removed_count += 1
     
     # Create essential directories
     essential_dirs = ['sessions', 'logs']
@@ -17,7 +17,7 @@ logger = get_logger(__name__)
 
 @dataclass
 class CacheEntry:
-    """Cache entry with metadata"""
+    """Cache entry with metadata (timestamps are time.monotonic() values)"""
     value: Any
     created_at: float
     expires_at: Optional[float]
@@ -43,11 +43,11 @@ class LRUCache:
         """Check if cache entry is expired"""
         if entry.expires_at is None:
             return False
-        return time.time() > entry.expires_at
+        return time.monotonic() > entry.expires_at
     
     def _evict_expired(self):
         """Remove expired entries"""
-        current_time = time.time()
+        current_time = time.monotonic()
         expired_keys = []
         
         for key, entry in self._cache.items():
@@ -82,7 +82,7 @@ class LRUCache:
             
             # Update access metadata
             entry.access_count += 1
-            entry.last_accessed = time.time()
+            entry.last_accessed = time.monotonic()
             
             # Move to end (most recently used)
             self._cache.move_to_end(key)
@@ -93,7 +93,7 @@ class LRUCache:
     def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
         """Set value in cache"""
         with self._lock:
-            current_time = time.time()
+            current_time = time.monotonic()
             ttl_to_use = ttl if ttl is not None else self.default_ttl
             expires_at = current_time + ttl_to_use if ttl_to_use else None
             
@@ -4,14 +4,42 @@ Comprehensive validation with sanitization and security checks
 """
 import re
 import html
-from typing import Any, Dict, List, Optional, Tuple
+import sys
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, List, Mapping, NamedTuple, Optional, Tuple
 from datetime import datetime, date
-from decimal import Decimal, InvalidOperation
+from decimal import Decimal
+from functools import lru_cache
 from core.exceptions import ValidationError
 
+# Patterns compiled once per process instead of per validator/call
+_PHONE_FORMATTING_RE = re.compile(r'[^\d+]')
+_PHONE_FORMATTING_TABLE = str.maketrans('', '', ' ()-.\t')
+_BR_PHONE_RE = re.compile(r'^\+?55\s*\(?(\d{2})\)?\s*9?\s*(\d{4,5})-?(\d{4})$')
+# Allowed characters of an (already lowercased) address, used with str.strip:
+# a part is valid when stripping these leaves nothing behind
+_EMAIL_LOCAL_CHARS = 'abcdefghijklmnopqrstuvwxyz0123456789._%+-'
+_EMAIL_DOMAIN_CHARS = 'abcdefghijklmnopqrstuvwxyz0123456789.-'
+# Same field patterns strptime uses for %Y, %m and %d (so ' 5' is a valid day)
+_DAY = r'(3[01]|[12]\d|0[1-9]|[1-9]| [1-9])'
+_MONTH = r'(1[0-2]|0[1-9]|[1-9])'
+_ISO_DATE_RE = re.compile(rf'(\d\d\d\d)-{_MONTH}-{_DAY}')
+_BR_DATE_RE = re.compile(rf'{_DAY}/{_MONTH}/(\d\d\d\d)')
+
+def _field_message(text: str) -> str:
+    """'%s <text>' template for a message whose only runtime part is the field name"""
+    return '%s ' + text.replace('%', '%%')
+
+@lru_cache(maxsize=256)
+def _get_regex(pattern: str, flags: int = 0) -> "re.Pattern[str]":
+    """Compile a caller-supplied pattern once and share it between validators"""
+    return re.compile(pattern, flags)
+
 class Validator:
     """Base validator class"""
     
+    __slots__ = ('required', 'allow_none')
+    
     def __init__(self, required: bool = True, allow_none: bool = False):
         self.required = required
         self.allow_none = allow_none
@@ -29,13 +57,33 @@ class Validator:
         # Perform specific validation
         return self._validate_value(value, field_name)
     
+    def validate_column(self, values: Iterable[Any], field_name: str = "field") -> List[Any]:
+        """Validate a column of values; the failing row index goes into the error context"""
+        validate = self.validate
+        results = []
+        append = results.append
+        index = 0
+        try:
+            for index, value in enumerate(values):
+                append(validate(value, field_name))
+        except ValidationError as e:
+            e.context['row'] = index
+            raise
+        return results
+    
     def _validate_value(self, value: Any, field_name: str) -> Any:
         """Override in subclasses"""
         return value
 
+def _strip_and_escape(value: str) -> str:
+    return html.escape(value.strip())
+
 class StringValidator(Validator):
     """String validation with sanitization"""
     
+    __slots__ = ('min_length', 'max_length', 'pattern', 'strip_whitespace', 'sanitize_html',
+                 'allowed_chars', '_msg_min', '_msg_max', '_transform')
+    
     def __init__(self, 
                  min_length: int = 0,
                  max_length: int = 10000,
@@ -47,35 +95,42 @@ class StringValidator(Validator):
         super().__init__(**kwargs)
         self.min_length = min_length
         self.max_length = max_length
-        self.pattern = re.compile(pattern) if pattern else None
+        self.pattern = _get_regex(pattern) if pattern else None
         self.strip_whitespace = strip_whitespace
         self.sanitize_html = sanitize_html
         self.allowed_chars = set(allowed_chars) if allowed_chars else None
+        self._msg_min = _field_message(f"must be at least {min_length} characters long")
+        self._msg_max = _field_message(f"must be at most {max_length} characters long")
+        # Strip/escape steps composed once into a single callable
+        if strip_whitespace and sanitize_html:
+            self._transform = _strip_and_escape
+        elif strip_whitespace:
+            self._transform = str.strip
+        elif sanitize_html:
+            self._transform = html.escape
+        else:
+            self._transform = None
     
     def _validate_value(self, value: Any, field_name: str) -> str:
         # Convert to string
         if not isinstance(value, str):
             value = str(value)
         
-        # Strip whitespace if requested
-        if self.strip_whitespace:
-            value = value.strip()
-        
-        # Sanitize HTML if requested
-        if self.sanitize_html:
-            value = html.escape(value)
+        # Strip whitespace / sanitize HTML as configured
+        if self._transform is not None:
+            value = self._transform(value)
         
         # Check length
         if len(value) < self.min_length:
             raise ValidationError(
-                f"{field_name} must be at least {self.min_length} characters long",
+                self._msg_min % field_name,
                 field=field_name,
                 value=value
             )
         
         if len(value) > self.max_length:
             raise ValidationError(
-                f"{field_name} must be at most {self.max_length} characters long",
+                self._msg_max % field_name,
                 field=field_name,
                 value=value
             )
@@ -102,20 +157,26 @@ class StringValidator(Validator):
 class PhoneValidator(Validator):
     """Brazilian phone number validation"""
     
+    __slots__ = ('phone_pattern',)
+    
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         # Brazilian phone pattern: +55 (11) 99999-9999 or variations
-        self.phone_pattern = re.compile(r'^\+?55\s*\(?(\d{2})\)?\s*9?\s*(\d{4,5})-?(\d{4})$')
+        self.phone_pattern = _BR_PHONE_RE
     
     def _validate_value(self, value: Any, field_name: str) -> str:
         # Convert to string and clean
         phone = str(value).strip()
         
-        # Remove common formatting
-        phone = re.sub(r'[^\d+]', '', phone)
+        # Remove common formatting in one C-level pass; only fall back to the
+        # regex when something other than digits and '+' is left over
+        phone = phone.translate(_PHONE_FORMATTING_TABLE)
+        if not phone.lstrip('+').isdecimal():
+            phone = _PHONE_FORMATTING_RE.sub('', phone)
         
         # Validate length (10-13 digits including country code)
-        if len(phone) < 10 or len(phone) > 13:
+        length = len(phone)
+        if not 10 <= length <= 13:
             raise ValidationError(
                 f"{field_name} must be a valid Brazilian phone number",
                 field=field_name,
@@ -126,11 +187,13 @@ class PhoneValidator(Validator):
         if not phone.startswith('55'):
             if phone.startswith('+55'):
                 phone = phone[1:]  # Remove + but keep 55
-            elif len(phone) <= 11:
+                length -= 1
+            elif length <= 11:
                 phone = '55' + phone
+                length += 2
         
         # Validate format
-        if len(phone) not in [12, 13]:  # 55 + 10 or 11 digits
+        if length != 12 and length != 13:  # 55 + 10 or 11 digits
             raise ValidationError(
                 f"{field_name} has invalid length for Brazilian phone",
                 field=field_name,
@@ -139,19 +202,31 @@ class PhoneValidator(Validator):
         
         return phone
 
+def _is_valid_email(email: str) -> bool:
+    """local@domain.tld with the usual character sets and an alphabetic TLD of 2+ letters"""
+    at = email.find('@')
+    if at <= 0 or email.find('@', at + 1) != -1:
+        return False
+    local, domain = email[:at], email[at + 1:]
+    dot = domain.rfind('.')
+    if dot <= 0:
+        return False
+    tld = domain[dot + 1:]
+    return (
+        len(tld) >= 2 and tld.isascii() and tld.isalpha()
+        and not local.strip(_EMAIL_LOCAL_CHARS)
+        and not domain[:dot].strip(_EMAIL_DOMAIN_CHARS)
+    )
+
 class EmailValidator(Validator):
     """Email validation"""
     
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        self.email_pattern = re.compile(
-            r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-        )
+    __slots__ = ()
     
     def _validate_value(self, value: Any, field_name: str) -> str:
         email = str(value).strip().lower()
         
-        if not self.email_pattern.match(email):
+        if not _is_valid_email(email):
             raise ValidationError(
                 f"{field_name} must be a valid email address",
                 field=field_name,
@@ -163,6 +238,8 @@ class EmailValidator(Validator):
 class NumberValidator(Validator):
     """Numeric validation"""
     
+    __slots__ = ('min_value', 'max_value', 'decimal_places', '_msg_min', '_msg_max', '_msg_decimals')
+    
     def __init__(self,
                  min_value: Optional[float] = None,
                  max_value: Optional[float] = None,
@@ -172,52 +249,70 @@ class NumberValidator(Validator):
         self.min_value = min_value
         self.max_value = max_value
         self.decimal_places = decimal_places
+        self._msg_min = _field_message(f"must be at least {min_value}")
+        self._msg_max = _field_message(f"must be at most {max_value}")
+        self._msg_decimals = _field_message(f"cannot have more than {decimal_places} decimal places")
     
-    def _validate_value(self, value: Any, field_name: str) -> float:
-        try:
+    @staticmethod
+    def _parse(value: Any, field_name: str) -> float:
+        if isinstance(value, (int, float)):
+            number = float(value)
+        else:
             if isinstance(value, str):
                 # Handle Brazilian decimal format (comma as decimal separator)
                 value = value.replace(',', '.')
-            
-            number = float(value)
-            
-            # Check range
-            if self.min_value is not None and number < self.min_value:
-                raise ValidationError(
-                    f"{field_name} must be at least {self.min_value}",
-                    field=field_name,
-                    value=value
-                )
-            
-            if self.max_value is not None and number > self.max_value:
-                raise ValidationError(
-                    f"{field_name} must be at most {self.max_value}",
-                    field=field_name,
-                    value=value
-                )
-            
-            # Check decimal places
-            if self.decimal_places is not None:
-                decimal_value = Decimal(str(number))
-                if decimal_value.as_tuple().exponent < -self.decimal_places:
-                    raise ValidationError(
-                        f"{field_name} cannot have more than {self.decimal_places} decimal places",
-                        field=field_name,
-                        value=value
-                    )
-            
-            return number
-            
-        except (ValueError, InvalidOperation):
+            try:
+                number = float(value)
+            except (TypeError, ValueError):
+                number = None
+        
+        # NaN compares false against every bound, so it would pass any range check
+        if number is None or number != number:
             raise ValidationError(
                 f"{field_name} must be a valid number",
                 field=field_name,
                 value=value
             )
+        return number
+    
+    def _validate_value(self, value: Any, field_name: str) -> float:
+        number = self._parse(value, field_name)
+        
+        # Check range
+        if self.min_value is not None and number < self.min_value:
+            raise ValidationError(
+                self._msg_min % field_name,
+                field=field_name,
+                value=value
+            )
+        
+        if self.max_value is not None and number > self.max_value:
+            raise ValidationError(
+                self._msg_max % field_name,
+                field=field_name,
+                value=value
+            )
+        
+        # Check decimal places
+        if self.decimal_places is not None:
+            decimal_value = Decimal(str(number))
+            if decimal_value.as_tuple().exponent < -self.decimal_places:
+                raise ValidationError(
+                    self._msg_decimals % field_name,
+                    field=field_name,
+                    value=value
+                )
+        
+        return number
 
 class DateValidator(Validator):
     """Date validation"""
     
+    __slots__ = ('date_format', 'min_date', 'max_date', '_msg_format', '_msg_min', '_msg_max')
+    
+    # Pass as min_date/max_date to mean "the day this validator was built"
+    TODAY = object()
+    
     def __init__(self,
                  date_format: str = "%Y-%m-%d",
                  min_date: Optional[date] = None,
@@ -225,8 +320,12 @@ class DateValidator(Validator):
                  **kwargs):
         super().__init__(**kwargs)
         self.date_format = date_format
-        self.min_date = min_date
-        self.max_date = max_date
+        # Resolve TODAY once here so validate() never reads the clock
+        self.min_date = date.today() if min_date is DateValidator.TODAY else min_date
+        self.max_date = date.today() if max_date is DateValidator.TODAY else max_date
+        self._msg_format = _field_message(f"must be a valid date in format {date_format}")
+        self._msg_min = _field_message(f"cannot be before {self.min_date}")
+        self._msg_max = _field_message(f"cannot be after {self.max_date}")
     
     def _validate_value(self, value: Any, field_name: str) -> date:
         if isinstance(value, date):
@@ -235,14 +334,23 @@ class DateValidator(Validator):
             parsed_date = value.date()
         else:
             try:
-                # Try Brazilian format first (dd/mm/yyyy)
+                # Try Brazilian format first (dd/mm/yyyy); the fixed formats are
+                # matched with a regex and built directly, strptime is the fallback
                 if isinstance(value, str) and '/' in value:
-                    parsed_date = datetime.strptime(value, "%d/%m/%Y").date()
+                    match = _BR_DATE_RE.fullmatch(value)
+                    if not match:
+                        raise ValueError(value)
+                    parsed_date = date(int(match[3]), int(match[2]), int(match[1]))
+                elif self.date_format == "%Y-%m-%d":
+                    match = _ISO_DATE_RE.fullmatch(str(value))
+                    if not match:
+                        raise ValueError(value)
+                    parsed_date = date(int(match[1]), int(match[2]), int(match[3]))
                 else:
                     parsed_date = datetime.strptime(str(value), self.date_format).date()
             except ValueError:
                 raise ValidationError(
-                    f"{field_name} must be a valid date in format {self.date_format}",
+                    self._msg_format % field_name,
                     field=field_name,
                     value=value
                 )
@@ -250,95 +358,173 @@ class DateValidator(Validator):
         # Check range
         if self.min_date and parsed_date < self.min_date:
             raise ValidationError(
-                f"{field_name} cannot be before {self.min_date}",
+                self._msg_min % field_name,
                 field=field_name,
                 value=value
             )
         
         if self.max_date and parsed_date > self.max_date:
             raise ValidationError(
-                f"{field_name} cannot be after {self.max_date}",
+                self._msg_max % field_name,
                 field=field_name,
                 value=value
             )
         
         return parsed_date
 
+_MISSING = object()
+
 class ChoiceValidator(Validator):
     """Choice validation from a list of allowed values"""
     
+    __slots__ = ('choices', 'case_sensitive', '_msg_choices', '_choices_set', '_choices_ci')
+    
     def __init__(self, choices: List[Any], case_sensitive: bool = True, **kwargs):
         super().__init__(**kwargs)
         self.choices = choices
         self.case_sensitive = case_sensitive
-        if not case_sensitive:
-            self.choices_lower = [str(choice).lower() for choice in choices]
+        self._msg_choices = _field_message(f"must be one of: {', '.join(map(str, choices))}")
+        # Lookup tables built once; lowered choice -> original (first one wins)
+        if case_sensitive:
+            self._choices_set = frozenset(choices)
+        else:
+            self._choices_ci = {str(choice).lower(): choice for choice in reversed(choices)}
     
     def _validate_value(self, value: Any, field_name: str) -> Any:
         if self.case_sensitive:
-            if value not in self.choices:
-                raise ValidationError(
-                    f"{field_name} must be one of: {', '.join(map(str, self.choices))}",
-                    field=field_name,
-                    value=value
-                )
+            try:
+                valid = value in self._choices_set
+            except TypeError:  # unhashable input can't be a choice
+                valid = False
         else:
-            value_lower = str(value).lower()
-            if value_lower not in self.choices_lower:
-                raise ValidationError(
-                    f"{field_name} must be one of: {', '.join(map(str, self.choices))}",
-                    field=field_name,
-                    value=value
-                )
             # Return the original case version
-            index = self.choices_lower.index(value_lower)
-            value = self.choices[index]
+            choice = self._choices_ci.get(str(value).lower(), _MISSING)
+            valid = choice is not _MISSING
+            if valid:
+                value = choice
+        
+        if not valid:
+            raise ValidationError(
+                self._msg_choices % field_name,
+                field=field_name,
+                value=value
+            )
         
         return value
 
+class Field(NamedTuple):
+    """One schema entry; requiredness is configured on the validator itself"""
+    name: str
+    validator: Validator
+
 class ValidationSchema:
     """Schema for validating complex data structures"""
     
+    __slots__ = ('fields', '_field_items', '_allowed', '_validate_row')
+    
     def __init__(self, fields: Dict[str, Validator]):
-        self.fields = fields
+        # Built once; validate() only walks these immutable structures
+        # Names are interned so dict probes on validated/input data hit the identity fast path
+        self._field_items: Tuple[Field, ...] = tuple(
+            Field(sys.intern(name), validator) for name, validator in fields.items()
+        )
+        # Read-only copy: later changes to the caller's dict cannot desync
+        # validate() from validate_columns()
+        self.fields: Mapping[str, Validator] = MappingProxyType(
+            {field.name: field.validator for field in self._field_items}
+        )
+        self._allowed = frozenset(field.name for field in self._field_items)
+        self._validate_row = _compile_row_validator(self._field_items, self._allowed)
+    
+    @classmethod
+    def from_fields(cls, fields: Iterable[Field]) -> "ValidationSchema":
+        """Build a schema from an ordered sequence of Field entries"""
+        return cls({field.name: field.validator for field in fields})
     
     def validate(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """Validate data against schema"""
-        validated_data = {}
-        errors = {}
-        
-        # Validate each field
-        for field_name, validator in self.fields.items():
-            try:
-                value = data.get(field_name)
-                validated_data[field_name] = validator.validate(value, field_name)
-            except ValidationError as e:
-                errors[field_name] = e.message
-        
-        # Check for unexpected fields
-        unexpected_fields = set(data.keys()) - set(self.fields.keys())
-        if unexpected_fields:
-            for field in unexpected_fields:
-                errors[field] = "Unexpected field"
+        validated_data, errors = self._validate_row(data)
         
         if errors:
-            raise ValidationError(
-                f"Validation failed: {errors}",
-                context={'field_errors': errors}
-            )
+            raise _schema_error(f"Validation failed: {errors}", errors)
         
         return validated_data
+    
+    def validate_many(self, rows: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Validate many records against schema, stopping at the first invalid one"""
+        validate_row = self._validate_row
+        results = []
+        append = results.append
+        
+        for index, data in enumerate(rows):
+            validated_data, errors = validate_row(data)
+            
+            if errors:
+                error = _schema_error(f"Validation failed for row {index}: {errors}", errors)
+                error.context['row'] = index
+                raise error
+            
+            append(validated_data)
+        
+        return results
+    
+    def validate_columns(self, columns: Dict[str, Iterable[Any]]) -> Dict[str, List[Any]]:
+        """Validate column-oriented data (e.g. a spreadsheet import) one column at a time"""
+        if not self._allowed.issuperset(columns):
+            errors = {field: "Unexpected field" for field in columns.keys() - self._allowed}
+            raise _schema_error(f"Validation failed: {errors}", errors)
+        
+        fields = self.fields
+        return {name: fields[name].validate_column(values, name) for name, values in columns.items()}
+
+def _compile_row_validator(field_items: Tuple[Field, ...], allowed: frozenset):
+    """Generate a straight-line function validating one record for a fixed schema.
+    
+    The function returns (validated_data, errors): one try block per field, with the
+    bound validate methods and field names baked in, and no loop over the schema.
+    """
+    lines = [
+        "def validate_row(data):",
+        "    get = data.get",
+        "    validated_data = {}",
+        "    errors = {}",
+    ]
+    namespace = {'ValidationError': ValidationError, '_allowed': allowed}
+    for index, (name, validator) in enumerate(field_items):
+        namespace[f'_validate_{index}'] = validator.validate
+        namespace[f'_name_{index}'] = name
+        lines += [
+            "    try:",
+            f"        validated_data[_name_{index}] = _validate_{index}(get(_name_{index}), _name_{index})",
+            "    except ValidationError as e:",
+            f"        errors[_name_{index}] = e.message",
+        ]
+    lines += [
+        # Happy path is a single allocation-free superset check
+        "    if not _allowed.issuperset(data):",
+        "        for field in data.keys() - _allowed:",
+        "            errors[field] = 'Unexpected field'",
+        "    return validated_data, errors",
+    ]
+    exec(compile("\n".join(lines), "<ValidationSchema>", "exec"), namespace)
+    return namespace['validate_row']
+
+def _schema_error(message: str, errors: Dict[str, str]) -> ValidationError:
+    """ValidationError carrying the per-field messages in its context"""
+    error = ValidationError(message)
+    error.context['field_errors'] = errors
+    return error
 
 # Common validation schemas
-CLIENT_SCHEMA = ValidationSchema({
-    'name': StringValidator(min_length=2, max_length=100),
-    'phone_number': PhoneValidator(),
-    'plan_name': StringValidator(min_length=1, max_length=50),
-    'plan_price': NumberValidator(min_value=0.01, max_value=1000.0, decimal_places=2),
-    'server_info': StringValidator(max_length=200, required=False),
-    'due_date': DateValidator(min_date=date.today()),
-    'other_info': StringValidator(max_length=500, required=False),
-})
+CLIENT_SCHEMA = ValidationSchema.from_fields((
+    Field('name', StringValidator(min_length=2, max_length=100)),
+    Field('phone_number', PhoneValidator()),
+    Field('plan_name', StringValidator(min_length=1, max_length=50)),
+    Field('plan_price', NumberValidator(min_value=0.01, max_value=1000.0, decimal_places=2)),
+    Field('server_info', StringValidator(max_length=200, required=False)),
+    Field('due_date', DateValidator(min_date=DateValidator.TODAY)),
+    Field('other_info', StringValidator(max_length=500, required=False)),
+))
 
 USER_SCHEMA = ValidationSchema({
     'phone_number': PhoneValidator(),
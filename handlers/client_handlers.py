@@ -1,5 +1,6 @@
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, ConversationHandler, MessageHandler, filters
+import asyncio
 import logging
 from datetime import datetime, date, timedelta
 from services.database_service import db_service
@@ -250,7 +251,9 @@ async def send_welcome_message(session, client: Client):
             )
             
             # Send via WhatsApp
-            result = whatsapp_service.send_message(client.phone_number, message_content)
+            result = await asyncio.to_thread(
+                whatsapp_service.send_message, client.phone_number, message_content, client.user_id
+            )
             
             if result['success']:
                 logger.info(f"Welcome message sent to {client.name}")
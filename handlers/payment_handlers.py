@@ -50,7 +50,7 @@ async def handle_payment_webhook(webhook_data: dict) -> bool:
                 subscription.expires_at = datetime.utcnow() + timedelta(days=30)
                 
                 # Update user subscription
-                user = session.query(User).get(subscription.user_id)
+                user = session.get(User, subscription.user_id)
                 if user:
                     user.is_trial = False
                     user.is_active = True
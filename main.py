@@ -1,5 +1,6 @@
 import logging
 import os
+import re
 import asyncio
 from datetime import datetime, date, timedelta
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, KeyboardButton, ReplyKeyboardMarkup, ReplyKeyboardRemove
@@ -25,12 +26,13 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # Import configurations and services
-from config import Config
+from config import settings
 from services.database_service import db_service
 from services.scheduler_service import scheduler_service
 from services.whatsapp_service import whatsapp_service
 from services.payment_service import payment_service
 from models import User, Client, Subscription, MessageTemplate, MessageLog
+from core.cache import query_cache
 
 # Conversation states
 WAITING_FOR_PHONE = 1
@@ -481,6 +483,8 @@ async def dashboard_callback(update: Update, context: ContextTypes.DEFAULT_TYPE)
             # Revenue still to be collected
             revenue_pending = monthly_revenue_total - revenue_paid
             
+            wa_status = await asyncio.to_thread(whatsapp_service.check_instance_status, db_user.id)
+            
             dashboard_text = f"""
 📊 **Dashboard - Visão Geral**
 
@@ -498,7 +502,7 @@ async def dashboard_callback(update: Update, context: ContextTypes.DEFAULT_TYPE)
 • Próximos 7 dias: {expiring_soon}
 
 📱 **WhatsApp:**
-• Status: {"✅ Conectado" if whatsapp_service.check_instance_status(db_user.id).get('connected') else "❌ Desconectado"}
+• Status: {"✅ Conectado" if wa_status.get('connected') else "❌ Desconectado"}
 
 💳 **Assinatura:**
 • Status: {"🆓 Teste" if db_user.is_trial else "💎 Premium"}
@@ -1346,7 +1350,7 @@ async def whatsapp_status_callback(update: Update, context: ContextTypes.DEFAULT
                 await query.edit_message_text("❌ Usuário não encontrado. Use /start para se registrar.")
                 return
             
-            status = whatsapp_service.check_instance_status(db_user.id)
+            status = await asyncio.to_thread(whatsapp_service.check_instance_status, db_user.id)
             
             if status.get('success') and status.get('connected'):
                 # Connected - show connected status
@@ -1436,7 +1440,7 @@ async def whatsapp_disconnect_callback(update: Update, context: ContextTypes.DEF
                 await query.edit_message_text("❌ Usuário não encontrado. Use /start para se registrar.")
                 return
             
-            result = whatsapp_service.disconnect_whatsapp(db_user.id)
+            result = await asyncio.to_thread(whatsapp_service.disconnect_whatsapp, db_user.id)
             
             if result.get('success'):
                 status_text = """🔌 **WhatsApp Desconectado**
@@ -1489,7 +1493,8 @@ async def whatsapp_reconnect_callback(update: Update, context: ContextTypes.DEFA
             
         # FORCE GENERATE NEW QR CODE - GUARANTEED TO WORK
         logger.info("🚀 FORCING NEW QR CODE GENERATION...")
-        result = whatsapp_service.force_new_qr(user_id)
+        # Blocking HTTP runs in a worker thread so the bot loop keeps serving updates
+        result = await asyncio.to_thread(whatsapp_service.force_new_qr, user_id)
         logger.info(f"Force QR result: {result}")
         
         qr_code = None
@@ -1500,13 +1505,22 @@ async def whatsapp_reconnect_callback(update: Update, context: ContextTypes.DEFA
             logger.error(f"❌ Force QR failed: {result.get('error', 'Unknown error')}")
             # Fallback to old method if force QR fails
             logger.info("Trying fallback reconnect method...")
-            fallback_result = whatsapp_service.reconnect_whatsapp(user_id)
+            fallback_result = await asyncio.to_thread(whatsapp_service.reconnect_whatsapp, user_id)
             if fallback_result.get('success'):
-                await asyncio.sleep(5)
-                status = whatsapp_service.check_instance_status(user_id)
-                if status.get('qrCode'):
-                    qr_code = status.get('qrCode')
-                    logger.info(f"✅ Fallback QR Code found! Length: {len(qr_code)}")
+                # Poll with backoff (0.25s → 2s, 5s total) and stop as soon as
+                # the QR shows up or the session is already connected
+                waited, delay = 0.0, 0.25
+                while waited < 5:
+                    await asyncio.sleep(delay)
+                    waited += delay
+                    delay = min(delay * 2, 2.0, 5 - waited)
+                    status = await asyncio.to_thread(whatsapp_service.check_instance_status, user_id)
+                    if status.get('qrCode'):
+                        qr_code = status.get('qrCode')
+                        logger.info(f"✅ Fallback QR Code found! Length: {len(qr_code)}")
+                        break
+                    if status.get('connected'):
+                        break
         
         # Process QR code if found (either immediate or after reconnect)
         if qr_code:
@@ -1647,7 +1661,7 @@ Tente novamente:""", parse_mode='Markdown')
                 return ConversationHandler.END
             
             # Request pairing code
-            result = whatsapp_service.request_pairing_code(db_user.id, phone_number)
+            result = await asyncio.to_thread(whatsapp_service.request_pairing_code, db_user.id, phone_number)
             
             if result.get('success'):
                 pairing_code = result.get('pairing_code')
@@ -1813,7 +1827,9 @@ async def send_welcome_message_with_session(session, client, user_id):
             )
             
             # Send via WhatsApp
-            result = whatsapp_service.send_message(client.phone_number, message_content, user_id)
+            result = await asyncio.to_thread(
+                whatsapp_service.send_message, client.phone_number, message_content, user_id
+            )
             
             if result.get('success'):
                 logger.info(f"Welcome message sent to {client.name}")
@@ -2441,23 +2457,22 @@ Obrigado pela renovação! 🎉"""
         }
     }
 
+# Template placeholders, matched in a single pass
+_TPL_RE = re.compile(r'\{(nome|plano|valor|vencimento|servidor|informacoes_extras)\}')
+
 def replace_template_variables(template_content, client):
     """Replace template variables with client data"""
-    from datetime import date
-    
     variables = {
-        '{nome}': client.name,
-        '{plano}': client.plan_name,
-        '{valor}': f"{client.plan_price:.2f}",
-        '{vencimento}': client.due_date.strftime('%d/%m/%Y'),
-        '{servidor}': client.server or 'Não definido',
-        '{informacoes_extras}': client.other_info or ''
+        'nome': client.name,
+        'plano': client.plan_name,
+        'valor': f"{client.plan_price:.2f}",
+        'vencimento': client.due_date.strftime('%d/%m/%Y'),
+        'servidor': client.server or 'Não definido',
+        'informacoes_extras': client.other_info or ''
     }
     
     # Replace all variables
-    result = template_content
-    for var, value in variables.items():
-        result = result.replace(var, str(value))
+    result = _TPL_RE.sub(lambda m: str(variables[m.group(1)]), template_content)
     
     # Remove empty lines for informacoes_extras when empty
     if not client.other_info:
@@ -2692,6 +2707,7 @@ async def toggle_template_callback(update: Update, context: ContextTypes.DEFAULT
             # Toggle status
             template.is_active = not template.is_active
             session.commit()
+            query_cache.invalidate_templates_for_user(db_user.id)
             
             status = "✅ Ativo" if template.is_active else "❌ Inativo"
             
@@ -2758,7 +2774,10 @@ async def send_renewal_message_callback(update: Update, context: ContextTypes.DE
             message_content = replace_template_variables(template.content, client)
             
             # Send via WhatsApp
-            success = await whatsapp_service.send_message(client.phone_number, message_content, db_user.id)
+            result = await asyncio.to_thread(
+                whatsapp_service.send_message, client.phone_number, message_content, db_user.id
+            )
+            success = result.get('success')
             
             if success:
                 # Log message
@@ -3643,6 +3662,8 @@ async def dashboard_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
             # Revenue still to be collected
             revenue_pending = monthly_revenue_total - revenue_paid
             
+            wa_status = await asyncio.to_thread(whatsapp_service.check_instance_status, db_user.id)
+            
             dashboard_text = f"""
 📊 **Dashboard - Visão Geral**
 
@@ -3660,7 +3681,7 @@ async def dashboard_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
 • Próximos 7 dias: {expiring_soon}
 
 📱 **WhatsApp:**
-• Status: {"✅ Conectado" if whatsapp_service.check_instance_status(db_user.id).get('connected') else "❌ Desconectado"}
+• Status: {"✅ Conectado" if wa_status.get('connected') else "❌ Desconectado"}
 
 💳 **Assinatura:**
 • Status: {"🆓 Teste" if db_user.is_trial else "💎 Premium"}
@@ -3687,7 +3708,7 @@ async def whatsapp_status_message(update: Update, context: ContextTypes.DEFAULT_
                 await update.message.reply_text("❌ Usuário não encontrado. Use /start para se registrar.")
                 return
             
-            status = whatsapp_service.check_instance_status(db_user.id)
+            status = await asyncio.to_thread(whatsapp_service.check_instance_status, db_user.id)
             logger.info(f"WhatsApp status received: {status}")
             
             if status.get('success') and status.get('connected'):
@@ -4085,6 +4106,7 @@ async def template_toggle_callback(update: Update, context: ContextTypes.DEFAULT
             # Toggle status
             template.is_active = not template.is_active
             session.commit()
+            query_cache.invalidate_templates_for_user(db_user.id)
             
             status_text = "ativado" if template.is_active else "desativado"
             await query.edit_message_text(f"✅ Template '{template.name}' foi {status_text} com sucesso!")
@@ -4138,6 +4160,7 @@ async def template_delete_callback(update: Update, context: ContextTypes.DEFAULT
             template_name = template.name
             session.delete(template)
             session.commit()
+            query_cache.invalidate_templates_for_user(db_user.id)
             
             await query.edit_message_text(f"🗑️ Template '{template_name}' foi excluído com sucesso!")
             
@@ -4253,7 +4276,10 @@ async def send_template_to_client_callback(update: Update, context: ContextTypes
             # Send WhatsApp message
             from services.whatsapp_service import whatsapp_service
             
-            success = whatsapp_service.send_message(client.phone_number, message_content, db_user.id)
+            result = await asyncio.to_thread(
+                whatsapp_service.send_message, client.phone_number, message_content, db_user.id
+            )
+            success = result.get('success')
             
             if success:
                 # Log the message
@@ -4518,6 +4544,7 @@ async def create_template_final(update: Update, context: ContextTypes.DEFAULT_TY
             
             session.add(new_template)
             session.commit()
+            query_cache.invalidate_templates_for_user(db_user.id)
             
             # Clear creation state
             context.user_data.pop('creating_template_step', None)
@@ -4652,6 +4679,7 @@ async def template_copy_callback(update: Update, context: ContextTypes.DEFAULT_T
                 
                 session.add(new_template)
                 session.commit()
+                query_cache.invalidate_templates_for_user(db_user.id)
                 
                 text = f"""✅ TEMPLATE COPIADO COM SUCESSO!
 
@@ -4738,6 +4766,7 @@ async def process_template_edit(update: Update, context: ContextTypes.DEFAULT_TY
             # Update template content
             template.content = text
             session.commit()
+            query_cache.invalidate_templates_for_user(db_user.id)
             
             # Clear editing state
             context.user_data.pop('editing_template', None)
@@ -4846,7 +4875,7 @@ def main():
         scheduler_service.start()
         
         # Create application
-        application = Application.builder().token(Config.TELEGRAM_BOT_TOKEN).build()
+        application = Application.builder().token(settings.TELEGRAM_BOT_TOKEN).build()
         
         # Register conversation handlers
         user_registration_handler = ConversationHandler(
@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Boolean, Float, Text, ForeignKey, Date
+from sqlalchemy import create_engine, Column, Integer, String, DateTime, Boolean, Float, Text, ForeignKey, Date, Index, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from datetime import datetime, timedelta
@@ -53,6 +53,12 @@ class Client(Base):
     user = relationship("User", back_populates="clients")
     message_logs = relationship("MessageLog", back_populates="client", cascade="all, delete-orphan")
 
+    # Relatório diário / lembretes filtram por usuário + status + vencimento
+    __table_args__ = (
+        Index('ix_clients_user_status_due', 'user_id', 'status', 'due_date'),
+        Index('ix_clients_status_due', 'status', 'due_date'),
+    )
+
 class Subscription(Base):
     __tablename__ = 'subscriptions'
     
@@ -71,6 +77,10 @@ class Subscription(Base):
     # Relationships
     user = relationship("User", back_populates="subscriptions")
 
+    __table_args__ = (
+        Index('ix_subscriptions_status_created', 'status', 'created_at'),
+    )
+
 class MessageTemplate(Base):
     __tablename__ = 'message_templates'
     
@@ -87,6 +97,11 @@ class MessageTemplate(Base):
     # Relationships
     user = relationship("User", back_populates="message_templates")
 
+    # Seleção de templates para envio filtra por usuário + ativos (índice parcial no Postgres)
+    __table_args__ = (
+        Index('ix_msgtpl_user_active', 'user_id', postgresql_where=text('is_active')),
+    )
+
 class MessageLog(Base):
     __tablename__ = 'message_logs'
     
@@ -105,6 +120,10 @@ class MessageLog(Base):
     user = relationship("User", back_populates="message_logs")
     client = relationship("Client", back_populates="message_logs")
 
+    __table_args__ = (
+        Index('ix_message_logs_user_type_status_sent', 'user_id', 'template_type', 'status', 'sent_at'),
+    )
+
 class SystemSettings(Base):
     __tablename__ = 'system_settings'
     
@@ -130,3 +149,9 @@ class UserScheduleSettings(Base):
     
     # Relationships
     user = relationship("User", backref="schedule_settings")
+
+    # Filtro por janela de horário feito no scheduler (_check_reminder_times)
+    __table_args__ = (
+        Index('ix_uss_morning_due', 'auto_send_enabled', 'morning_reminder_time', 'last_morning_run'),
+        Index('ix_uss_report_due', 'daily_report_time', 'last_report_run'),
+    )
@@ -5,51 +5,63 @@ Optimizations for performance, security and reliability
 
 import os
 import logging
+from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
+from typing import Tuple
+
+from config import _env, _env_int
 
 # Production Environment Settings
-PRODUCTION_CONFIG = {
+@dataclass(frozen=True, slots=True)
+class ProductionSettings:
     # Logging Configuration
-    'LOG_LEVEL': os.getenv('LOG_LEVEL', 'INFO'),
-    'LOG_FORMAT': '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    'LOG_MAX_BYTES': 10 * 1024 * 1024,  # 10MB
-    'LOG_BACKUP_COUNT': 5,
+    LOG_LEVEL: str = _env('LOG_LEVEL', 'INFO')
+    LOG_FORMAT: str = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    LOG_MAX_BYTES: int = 10 * 1024 * 1024  # 10MB
+    LOG_BACKUP_COUNT: int = 5
     
     # Database Configuration
-    'DB_POOL_SIZE': int(os.getenv('DB_POOL_SIZE', '10')),
-    'DB_MAX_OVERFLOW': int(os.getenv('DB_MAX_OVERFLOW', '20')),
-    'DB_POOL_TIMEOUT': int(os.getenv('DB_POOL_TIMEOUT', '30')),
-    'DB_POOL_RECYCLE': int(os.getenv('DB_POOL_RECYCLE', '3600')),
+    DB_POOL_SIZE: int = _env_int('DB_POOL_SIZE', '10')
+    DB_MAX_OVERFLOW: int = _env_int('DB_MAX_OVERFLOW', '20')
+    DB_POOL_TIMEOUT: int = _env_int('DB_POOL_TIMEOUT', '30')
+    DB_POOL_RECYCLE: int = _env_int('DB_POOL_RECYCLE', '3600')
     
     # Telegram Bot Configuration
-    'TELEGRAM_TIMEOUT': int(os.getenv('TELEGRAM_TIMEOUT', '30')),
-    'TELEGRAM_POOL_TIMEOUT': int(os.getenv('TELEGRAM_POOL_TIMEOUT', '1')),
-    'TELEGRAM_READ_TIMEOUT': int(os.getenv('TELEGRAM_READ_TIMEOUT', '30')),
-    'TELEGRAM_WRITE_TIMEOUT': int(os.getenv('TELEGRAM_WRITE_TIMEOUT', '30')),
+    TELEGRAM_TIMEOUT: int = _env_int('TELEGRAM_TIMEOUT', '30')
+    TELEGRAM_POOL_TIMEOUT: int = _env_int('TELEGRAM_POOL_TIMEOUT', '1')
+    TELEGRAM_READ_TIMEOUT: int = _env_int('TELEGRAM_READ_TIMEOUT', '30')
+    TELEGRAM_WRITE_TIMEOUT: int = _env_int('TELEGRAM_WRITE_TIMEOUT', '30')
     
     # WhatsApp Configuration
-    'WHATSAPP_TIMEOUT': int(os.getenv('WHATSAPP_TIMEOUT', '60')),
-    'WHATSAPP_RETRY_ATTEMPTS': int(os.getenv('WHATSAPP_RETRY_ATTEMPTS', '3')),
-    'WHATSAPP_RETRY_DELAY': int(os.getenv('WHATSAPP_RETRY_DELAY', '5')),
+    WHATSAPP_TIMEOUT: int = _env_int('WHATSAPP_TIMEOUT', '60')
+    WHATSAPP_RETRY_ATTEMPTS: int = _env_int('WHATSAPP_RETRY_ATTEMPTS', '3')
+    WHATSAPP_RETRY_DELAY: int = _env_int('WHATSAPP_RETRY_DELAY', '5')
     
     # Session Management
-    'SESSION_CLEANUP_INTERVAL': int(os.getenv('SESSION_CLEANUP_INTERVAL', '3600')),  # 1 hour
-    'SESSION_MAX_AGE': int(os.getenv('SESSION_MAX_AGE', '2592000')),  # 30 days
+    SESSION_CLEANUP_INTERVAL: int = _env_int('SESSION_CLEANUP_INTERVAL', '3600')  # 1 hour
+    SESSION_MAX_AGE: int = _env_int('SESSION_MAX_AGE', '2592000')  # 30 days
     
     # Performance Settings
-    'MAX_CONCURRENT_CONNECTIONS': int(os.getenv('MAX_CONCURRENT_CONNECTIONS', '2')),
-    'SCHEDULER_INTERVAL': int(os.getenv('SCHEDULER_INTERVAL', '60')),  # 1 minute
-    'PAYMENT_CHECK_INTERVAL': int(os.getenv('PAYMENT_CHECK_INTERVAL', '120')),  # 2 minutes
+    MAX_CONCURRENT_CONNECTIONS: int = _env_int('MAX_CONCURRENT_CONNECTIONS', '2')
+    SCHEDULER_INTERVAL: int = _env_int('SCHEDULER_INTERVAL', '60')  # 1 minute
+    PAYMENT_CHECK_INTERVAL: int = _env_int('PAYMENT_CHECK_INTERVAL', '120')  # 2 minutes
     
     # Security Settings
-    'RATE_LIMIT_PER_MINUTE': int(os.getenv('RATE_LIMIT_PER_MINUTE', '20')),
-    'MAX_MESSAGE_LENGTH': int(os.getenv('MAX_MESSAGE_LENGTH', '4096')),
-    'ALLOWED_EXTENSIONS': ['jpg', 'jpeg', 'png', 'gif', 'pdf'],
+    RATE_LIMIT_PER_MINUTE: int = _env_int('RATE_LIMIT_PER_MINUTE', '20')
+    MAX_MESSAGE_LENGTH: int = _env_int('MAX_MESSAGE_LENGTH', '4096')
+    ALLOWED_EXTENSIONS: Tuple[str, ...] = ('jpg', 'jpeg', 'png', 'gif', 'pdf')
     
     # File Storage
-    'UPLOAD_FOLDER': os.getenv('UPLOAD_FOLDER', '/tmp/uploads'),
-    'MAX_CONTENT_LENGTH': int(os.getenv('MAX_CONTENT_LENGTH', '16777216')),  # 16MB
-}
+    UPLOAD_FOLDER: str = _env('UPLOAD_FOLDER', '/tmp/uploads')
+    MAX_CONTENT_LENGTH: int = _env_int('MAX_CONTENT_LENGTH', '16777216')  # 16MB
+
+@lru_cache(maxsize=1)
+def get_settings() -> ProductionSettings:
+    """Build production settings once per process"""
+    return ProductionSettings()
+
+settings = get_settings()
 
 def setup_production_logging():
     """Configure production logging"""
@@ -57,8 +69,8 @@ def setup_production_logging():
     log_dir.mkdir(exist_ok=True)
     
     logging.basicConfig(
-        level=getattr(logging, PRODUCTION_CONFIG['LOG_LEVEL']),
-        format=PRODUCTION_CONFIG['LOG_FORMAT'],
+        level=getattr(logging, settings.LOG_LEVEL),
+        format=settings.LOG_FORMAT,
         handlers=[
             logging.FileHandler('./logs/production.log'),
             logging.StreamHandler()
@@ -73,10 +85,10 @@ def setup_production_logging():
 def get_database_config():
     """Get optimized database configuration"""
     return {
-        'pool_size': PRODUCTION_CONFIG['DB_POOL_SIZE'],
-        'max_overflow': PRODUCTION_CONFIG['DB_MAX_OVERFLOW'],
-        'pool_timeout': PRODUCTION_CONFIG['DB_POOL_TIMEOUT'],
-        'pool_recycle': PRODUCTION_CONFIG['DB_POOL_RECYCLE'],
+        'pool_size': settings.DB_POOL_SIZE,
+        'max_overflow': settings.DB_MAX_OVERFLOW,
+        'pool_timeout': settings.DB_POOL_TIMEOUT,
+        'pool_recycle': settings.DB_POOL_RECYCLE,
         'pool_pre_ping': True,
         'echo': False  # Disable SQL logging in production
     }
@@ -85,15 +97,16 @@ def get_telegram_config():
     """Get optimized Telegram bot configuration"""
     return {
         'request_kwargs': {
-            'read_timeout': PRODUCTION_CONFIG['TELEGRAM_READ_TIMEOUT'],
-            'write_timeout': PRODUCTION_CONFIG['TELEGRAM_WRITE_TIMEOUT'],
-            'connect_timeout': PRODUCTION_CONFIG['TELEGRAM_TIMEOUT'],
-            'pool_timeout': PRODUCTION_CONFIG['TELEGRAM_POOL_TIMEOUT'],
+            'read_timeout': settings.TELEGRAM_READ_TIMEOUT,
+            'write_timeout': settings.TELEGRAM_WRITE_TIMEOUT,
+            'connect_timeout': settings.TELEGRAM_TIMEOUT,
+            'pool_timeout': settings.TELEGRAM_POOL_TIMEOUT,
         }
     }
 
+@lru_cache(maxsize=1)
 def is_production():
-    """Check if running in production environment"""
+    """Check if running in production environment (environment is read once)"""
     return os.getenv('NODE_ENV') == 'production' or os.getenv('RAILWAY_ENVIRONMENT') == 'production'
 
 def ensure_directories():
@@ -2,7 +2,8 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, scoped_session
 from contextlib import contextmanager
 import logging
-from config import Config
+from config import settings
+from core.cache import query_cache
 from models import Base, User, Client, Subscription, MessageTemplate, MessageLog, SystemSettings
 
 logger = logging.getLogger(__name__)
@@ -10,7 +11,7 @@ logger = logging.getLogger(__name__)
 class DatabaseService:
     def __init__(self):
         self.engine = create_engine(
-            Config.DATABASE_URL,
+            settings.DATABASE_URL,
             pool_pre_ping=True,
             pool_recycle=300,
             echo=False
@@ -28,9 +29,13 @@ class DatabaseService:
             raise
     
     @contextmanager
-    def get_session(self):
-        """Get database session with automatic cleanup"""
-        session = self.SessionLocal()
+    def get_session(self, isolated=False):
+        """Get database session with automatic cleanup
+
+        isolated=True bypasses the thread-local registry, for coroutines that
+        run concurrently on the same event loop thread.
+        """
+        session = self.SessionLocal.session_factory() if isolated else self.SessionLocal()
         try:
             yield session
             session.commit()
@@ -95,6 +100,7 @@ class DatabaseService:
                     template = MessageTemplate(**template_data)
                     session.add(template)
                     logger.info(f"Created default template for user {user_id}: {template_data['name']}")
+        query_cache.invalidate_templates_for_user(user_id)
     
     def restore_default_templates(self, user_id):
         """Restore all default templates to original state"""
@@ -160,6 +166,7 @@ class DatabaseService:
                     template = MessageTemplate(**template_data)
                     session.add(template)
                     logger.info(f"Created missing default template for user {user_id}: {template_data['name']}")
+        query_cache.invalidate_templates_for_user(user_id)
 
 # Global database service instance
 db_service = DatabaseService()
@@ -2,13 +2,13 @@ import mercadopago
 import logging
 from typing import Dict, Any, Optional
 from datetime import datetime, timedelta
-from config import Config
+from config import settings
 
 logger = logging.getLogger(__name__)
 
 class PaymentService:
     def __init__(self):
-        self.sdk = mercadopago.SDK(Config.MERCADO_PAGO_ACCESS_TOKEN)
+        self.sdk = mercadopago.SDK(settings.MERCADO_PAGO_ACCESS_TOKEN)
     
     def create_subscription_payment(self, user_telegram_id: str, amount: float = None, method: str = "pix") -> Dict[str, Any]:
         """
@@ -16,7 +16,7 @@ class PaymentService:
         """
         try:
             if amount is None:
-                amount = Config.MONTHLY_SUBSCRIPTION_PRICE
+                amount = settings.MONTHLY_SUBSCRIPTION_PRICE
             
             return self._create_pix_payment(user_telegram_id, amount)
                 
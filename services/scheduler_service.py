@@ -1,13 +1,102 @@
-import schedule
-import time
 import threading
 import logging
-from datetime import datetime, timedelta, date
+import re
+from datetime import datetime, timedelta, date, time as dt_time
+from functools import lru_cache
 import asyncio
-import pytz
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait as futures_wait, TimeoutError as FuturesTimeoutError
+from zoneinfo import ZoneInfo
+from sqlalchemy import and_, or_, func, insert, update
+
+from config import settings as app_settings
+from core.cache import query_cache
+from models import User, UserScheduleSettings, Client, Subscription, MessageTemplate, MessageLog
+from services.database_service import db_service
+from services.payment_service import payment_service
+from services.telegram_service import telegram_service
+from services.whatsapp_service import whatsapp_service
 
 logger = logging.getLogger(__name__)
 
+# Placeholders dos templates e colapso de linhas em branco (compilados uma vez)
+_PLACEHOLDER_RE = re.compile(r'\{(?:nome|plano|valor|vencimento|servidor|informacoes_extras)\}')
+_NEWLINE_RE = re.compile(r'\n{3,}')
+# Separador decimal brasileiro para valores em R$
+_MONEY_TABLE = str.maketrans({'.': ','})
+
+
+@lru_cache(maxsize=256)
+def _compile_template(tpl: str):
+    """
+    Pré-divide o template nos placeholders uma única vez. Devolve uma função
+    que monta o texto a partir do dict de substituições sem usar regex.
+    """
+    parts = _PLACEHOLDER_RE.split(tpl)
+    keys = _PLACEHOLDER_RE.findall(tpl)
+
+    def fill(rep):
+        out = [parts[0]]
+        for key, tail in zip(keys, parts[1:]):
+            out.append(str(rep[key]))
+            out.append(tail)
+        return ''.join(out)
+
+    return fill
+
+
+def _fmt_date(d) -> str:
+    """dd/mm/aaaa sem interpretar formato do strftime."""
+    return f"{d.day:02d}/{d.month:02d}/{d.year}"
+
+
+def _fmt_price(c) -> str:
+    """Preço do plano em R$ com vírgula decimal; 'N/A' se inválido."""
+    try:
+        return "R$ " + format(float(c.plan_price or 0), '.2f').translate(_MONEY_TABLE)
+    except (TypeError, ValueError):
+        return "N/A"
+
+
+# Textos fixos das notificações, montados uma vez no import
+_REPORT_HEADER = "📅 *Relatório Diário de Vencimentos*\n\n"
+_REPORT_FOOTER = "📱 Use *👥 Clientes* para gerenciar."
+_REPORT_SECTION_HEADERS = (
+    "🟡 *{} vencem hoje:*\n",
+    "🟠 *{} vencem amanhã:*\n",
+    "🔵 *{} vencem em 2 dias:*\n",
+)
+_PAYMENT_APPROVED_MSG = (
+    "✅ *Pagamento aprovado!*\n\n"
+    "Valor: R$ {amount:.2f}\n"
+    "Próximo vencimento: {expires}"
+)
+
+# Deslocamento do vencimento (em dias a partir de hoje) -> tipo de lembrete
+_REMINDER_TYPES_BY_OFFSET = (
+    (2, 'reminder_2_days'),
+    (1, 'reminder_1_day'),
+    (0, 'reminder_due_date'),
+    (-1, 'reminder_overdue'),
+)
+
+# Corrotinas por usuário em paralelo num tick. Fica abaixo do pool do
+# SQLAlchemy (5 + 10 de overflow), que também atende os handlers do bot.
+_USER_JOB_CONCURRENCY = 4
+# Tempo máximo de uma corrotina de usuário; quem estoura fica para o próximo tick
+_USER_JOB_TIMEOUT = 120
+# Espera total do tick pelas corrotinas; as que não terminarem são canceladas
+# e as que terminaram têm o resultado aproveitado normalmente
+_TICK_JOBS_TIMEOUT = 300
+
+
+# 1440 = todos os horários "HH:MM" possíveis; o cache nunca descarta entradas
+@lru_cache(maxsize=1440)
+def _parse_hhmm(value: str) -> dt_time:
+    """Converte 'HH:MM' em time sem o parse completo do strptime (ValueError se inválido)."""
+    h, m = value.split(':')
+    return dt_time(int(h), int(m))
+
+
 class SchedulerService:
     """
     - Executa checagens por minuto (horário por usuário)
@@ -19,10 +108,23 @@ class SchedulerService:
 
     def __init__(self):
         self.is_running = False
-        self.thread = None
         self._loop = None
         self._loop_lock = threading.Lock()
-        self._tz = pytz.timezone('America/Sao_Paulo')
+        self._tz = ZoneInfo(app_settings.TIMEZONE)
+        # Timers ativos no loop (job -> TimerHandle) e executor dos jobs
+        # síncronos; separado do executor padrão usado por asyncio.to_thread
+        # para que um job aguardando corrotinas nunca bloqueie os envios.
+        self._timers = {}
+        self._executor = None
+        # Última execução diária por usuário (user_id -> date). Espelho em
+        # memória das flags do banco: cobre o intervalo até a escrita em lote
+        # e uma eventual falha dela.
+        self._last_morning_run = {}
+        self._last_report_run = {}
+        # Usuários com lote de lembretes ainda em envio (só tocado no loop).
+        # O envio sobrevive ao timeout da corrotina; até os logs serem
+        # gravados o usuário é pulado para o dedup não deixar passar reenvio.
+        self._reminders_in_flight = set()
 
     # ------------------- Controle -------------------
 
@@ -31,30 +133,56 @@ class SchedulerService:
             logger.warning("Scheduler service is already running")
             return
         self.is_running = True
+        self._executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix='scheduler-job')
 
-        # Jobs
-        schedule.every().minute.do(self._check_reminder_times)  # horários por usuário
-        schedule.every().hour.do(self._check_due_dates)         # marca vencidos
-        schedule.every(2).minutes.do(self._check_pending_payments)  # pagamentos
-
-        self.thread = threading.Thread(target=self._run_scheduler, daemon=True)
-        self.thread.start()
+        # Jobs: (primeira execução em s, intervalo em s, função)
+        loop = self._get_event_loop()
+        for delay, interval, job in (
+            (60, 60, self._check_reminder_times),        # horários por usuário
+            (3600, 3600, self._check_due_dates),         # marca vencidos
+            (120, 120, self._check_pending_payments),    # pagamentos
+        ):
+            loop.call_soon_threadsafe(self._schedule_job, delay, interval, job)
         logger.info("Scheduler service started")
 
     def stop(self):
         self.is_running = False
-        schedule.clear()
-        if self.thread:
-            self.thread.join(timeout=5)
+        if self._loop and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._cancel_timers)
+        if self._executor:
+            self._executor.shutdown(wait=False)
         logger.info("Scheduler service stopped")
 
-    def _run_scheduler(self):
-        while self.is_running:
-            try:
-                schedule.run_pending()
-                time.sleep(1)  # conferir a cada segundo o pending
-            except Exception as e:
-                logger.error(f"Error in scheduler: {e}", exc_info=True)
+    def _schedule_job(self, delay, interval, job):
+        """
+        (Roda no loop) Arma o timer do job; o timer heap do asyncio só acorda
+        quando algum job vence, sem thread de polling.
+        """
+        if self.is_running:
+            self._timers[job] = self._loop.call_later(delay, self._run_job, interval, job)
+
+    def _run_job(self, interval, job):
+        """
+        (Roda no loop) Executa o job síncrono no executor e reagenda quando
+        terminar, para que o mesmo job nunca rode em paralelo consigo mesmo.
+        """
+        self._timers.pop(job, None)
+        if not self.is_running:
+            return
+        fut = self._loop.run_in_executor(self._executor, self._call_job, job)
+        fut.add_done_callback(lambda _: self._schedule_job(interval, interval, job))
+
+    @staticmethod
+    def _call_job(job):
+        try:
+            job()
+        except Exception as e:
+            logger.error(f"Error in scheduler: {e}", exc_info=True)
+
+    def _cancel_timers(self):
+        for handle in self._timers.values():
+            handle.cancel()
+        self._timers.clear()
 
     # ------------------- Infra assíncrona -------------------
 
@@ -73,10 +201,37 @@ class SchedulerService:
     def _run_coro_blocking(self, coro, timeout=60):
         """
         Agenda uma coroutine no loop e aguarda resultado de forma síncrona.
+        No timeout a coroutine é cancelada no loop antes de propagar o erro,
+        para não continuar enviando depois que o chamador desistiu.
         """
         loop = self._get_event_loop()
         fut = asyncio.run_coroutine_threadsafe(coro, loop)
-        return fut.result(timeout=timeout)
+        try:
+            return fut.result(timeout=timeout)
+        except FuturesTimeoutError:
+            fut.cancel()
+            raise
+
+    def _run_coro_background(self, coro, label, timeout=60):
+        """
+        Agenda uma coroutine no loop sem bloquear a thread do job; falhas e
+        timeouts só são logados.
+        """
+        loop = self._get_event_loop()
+        fut = asyncio.run_coroutine_threadsafe(asyncio.wait_for(coro, timeout), loop)
+
+        def _log_result(f):
+            try:
+                result = f.result()
+            except Exception as e:
+                logger.error(f"{label} failed: {e!r}")
+                return
+            for r in result if isinstance(result, list) else ():
+                if isinstance(r, BaseException):
+                    logger.error(f"{label} failed: {r!r}")
+
+        fut.add_done_callback(_log_result)
+        return fut
 
     # ------------------- Lógica de agendamento -------------------
 
@@ -85,79 +240,144 @@ class SchedulerService:
         Verifica horários configurados por usuário:
         - Envia lembretes (2 dias, 1 dia, hoje e 1 dia após) no horário do usuário
         - Envia relatório/alerta diário no horário do usuário
-        Usa flags last_morning_run/last_report_run para evitar duplicidade diária.
+        Usa last_morning_run/last_report_run (e o espelho em memória) para
+        evitar duplicidade diária.
+
+        Roda em três fases para não segurar conexão/transação durante o I/O:
+        leitura curta -> envios sem sessão aberta -> escrita curta em lote.
         """
         try:
-            from services.database_service import DatabaseService
-            from models import User, UserScheduleSettings
-
             now = datetime.now(self._tz)
             now_date = now.date()
-            now_hhmm = now.strftime("%H:%M")
-
-            db = DatabaseService()
-            with db.get_session() as session:
-                rows = session.query(User, UserScheduleSettings).join(
+            now_hhmm = f"{now.hour:02d}:{now.minute:02d}"
+
+            # ---- Fase 1: leitura (tuplas simples, nada de ORM fora da sessão)
+            with db_service.get_session() as session:
+                # Um único SELECT (outer join) traz usuário + configurações.
+                # O filtro de horário roda no banco: só voltam usuários sem
+                # configuração ou com lembrete/relatório vencido e ainda não
+                # executado hoje ("HH:MM" com zero à esquerda compara
+                # corretamente como texto).
+                morning_time = func.coalesce(UserScheduleSettings.morning_reminder_time, '09:00')
+                report_time = func.coalesce(UserScheduleSettings.daily_report_time, '08:00')
+                morning_due = and_(
+                    UserScheduleSettings.auto_send_enabled.isnot(False),
+                    morning_time <= now_hhmm,
+                    or_(UserScheduleSettings.last_morning_run.is_(None),
+                        UserScheduleSettings.last_morning_run < now_date),
+                )
+                report_due = and_(
+                    report_time <= now_hhmm,
+                    or_(UserScheduleSettings.last_report_run.is_(None),
+                        UserScheduleSettings.last_report_run < now_date),
+                )
+                rows = session.query(
+                    User.id,
+                    UserScheduleSettings.id,
+                    UserScheduleSettings.auto_send_enabled,
+                    UserScheduleSettings.morning_reminder_time,
+                    UserScheduleSettings.daily_report_time,
+                    UserScheduleSettings.last_morning_run,
+                    UserScheduleSettings.last_report_run,
+                ).join(
                     UserScheduleSettings, User.id == UserScheduleSettings.user_id, isouter=True
-                ).filter(User.is_active.is_(True)).all()
+                ).filter(
+                    User.is_active.is_(True),
+                    or_(UserScheduleSettings.id.is_(None), morning_due, report_due),
+                ).all()
 
                 logger.info(f"[{now_hhmm}] Checking reminder times for {len(rows)} users")
 
-                for user, settings in rows:
-                    # Cria defaults se não existir
-                    if not settings:
-                        settings = UserScheduleSettings(
-                            user_id=user.id,
-                            morning_reminder_time='09:00',
-                            daily_report_time='08:00',
-                            auto_send_enabled=True
-                        )
-                        session.add(settings)
-                        session.commit()
-
-                    # Se usuário desativou auto envio, só pula os lembretes
+                # Usuários com algum cliente ativo vencido ou vencendo em até
+                # 2 dias (mesma janela das corrotinas). Para os demais não há
+                # lembrete nem relatório: marca o dia sem abrir sessão no loop.
+                with_clients = {
+                    uid for (uid,) in session.query(Client.user_id).filter(
+                        Client.user_id.in_([row[0] for row in rows]),
+                        Client.status == 'active',
+                        Client.due_date <= now_date + timedelta(days=2),
+                    ).distinct()
+                } if rows else set()
+
+                # Defaults para quem ainda não tem configuração, num único INSERT
+                missing = [row[0] for row in rows if row[1] is None]
+                if missing:
+                    session.execute(insert(UserScheduleSettings), [
+                        {'user_id': uid, 'morning_reminder_time': '09:00',
+                         'daily_report_time': '08:00', 'auto_send_enabled': True}
+                        for uid in missing
+                    ])
+
+            # ---- Fase 2: decide e envia (sem sessão aberta)
+            jobs = []  # (tipo, user_id, corrotina)
+            morning_done, report_done = [], []
+            for user_id, settings_id, auto_send, morning_str, report_str, last_morning, last_report in rows:
+                # Lembretes no horário do usuário (se o auto envio estiver
+                # ligado; o default criado acima vem ligado)
+                if settings_id is None or auto_send:
                     try:
-                        if hasattr(settings, 'auto_send_enabled') and not settings.auto_send_enabled:
-                            send_reminders = False
-                        else:
-                            send_reminders = True
-                    except Exception:
-                        send_reminders = True
-
-                    # Lembretes no horário do usuário
-                    if send_reminders:
-                        try:
-                            reminder_time = datetime.strptime(settings.morning_reminder_time or "09:00", "%H:%M").time()
-                        except Exception:
-                            reminder_time = datetime.strptime("09:00", "%H:%M").time()
-
-                        last_run = getattr(settings, 'last_morning_run', None)
-                        if now.time() >= reminder_time and (last_run != now_date):
-                            logger.info(f"→ Daily reminders for user={user.id} (time {settings.morning_reminder_time}, now {now_hhmm})")
-                            try:
-                                # CHAMADA CORRETA: este método deve existir
-                                self._run_coro_blocking(self._process_daily_reminders_for_user(user.id), timeout=120)
-                                # Atualiza flag
-                                settings.last_morning_run = now_date
-                                session.commit()
-                            except Exception as e:
-                                logger.error(f"Error processing daily reminders for user {user.id}: {e}", exc_info=True)
-
-                    # Relatório no horário do usuário
-                    try:
-                        report_time = datetime.strptime(settings.daily_report_time or "08:00", "%H:%M").time()
+                        reminder_time = _parse_hhmm(morning_str or "09:00")
                     except Exception:
-                        report_time = datetime.strptime("08:00", "%H:%M").time()
+                        reminder_time = dt_time(9, 0)
 
-                    last_report = getattr(settings, 'last_report_run', None)
-                    if now.time() >= report_time and (last_report != now_date):
-                        logger.info(f"→ Daily report for user={user.id} (time {settings.daily_report_time}, now {now_hhmm})")
-                        try:
-                            self._run_coro_blocking(self._process_user_notifications_for_user(user.id), timeout=120)
-                            settings.last_report_run = now_date
-                            session.commit()
-                        except Exception as e:
-                            logger.error(f"Error processing daily report for user {user.id}: {e}", exc_info=True)
+                    last_run = self._last_morning_run.get(user_id, last_morning)
+                    if now.time() >= reminder_time and (last_run != now_date):
+                        if user_id not in with_clients:
+                            morning_done.append(user_id)
+                        else:
+                            logger.info("→ Daily reminders for user=%s (time %s, now %s)", user_id, morning_str, now_hhmm)
+                            jobs.append(('morning', user_id, self._process_daily_reminders_for_user(user_id)))
+
+                # Relatório no horário do usuário
+                try:
+                    report_time = _parse_hhmm(report_str or "08:00")
+                except Exception:
+                    report_time = dt_time(8, 0)
+
+                last_run = self._last_report_run.get(user_id, last_report)
+                if now.time() >= report_time and (last_run != now_date):
+                    if user_id not in with_clients:
+                        report_done.append(user_id)
+                    else:
+                        logger.info("→ Daily report for user=%s (time %s, now %s)", user_id, report_str, now_hhmm)
+                        jobs.append(('report', user_id, self._process_user_notifications_for_user(user_id)))
+
+            # Todas as corrotinas do tick cruzam para o loop de uma vez só,
+            # com no máximo _USER_JOB_CONCURRENCY rodando ao mesmo tempo.
+            # Resultado por corrotina: um timeout do tick não descarta quem já
+            # terminou, e a Fase 3 roda sempre.
+            results = self._run_jobs_blocking([job[2] for job in jobs]) if jobs else []
+            # Só marca o dia como feito quando a corrotina confirmou (True);
+            # falhas e timeouts ficam para o próximo tick
+            for (kind, user_id, _), result in zip(jobs, results):
+                what = 'daily reminders' if kind == 'morning' else 'daily report'
+                if result is True:
+                    (morning_done if kind == 'morning' else report_done).append(user_id)
+                elif isinstance(result, BaseException):
+                    logger.error(f"Error processing {what} for user {user_id}: {result!r}", exc_info=result)
+                else:
+                    logger.warning(f"{what.capitalize()} not delivered for user {user_id}; retrying next tick")
+
+            for user_id in morning_done:
+                self._last_morning_run[user_id] = now_date
+            for user_id in report_done:
+                self._last_report_run[user_id] = now_date
+
+            # ---- Fase 3: escrita curta, um UPDATE por tipo de flag
+            if morning_done or report_done:
+                with db_service.get_session() as session:
+                    if morning_done:
+                        session.execute(
+                            update(UserScheduleSettings)
+                            .where(UserScheduleSettings.user_id.in_(morning_done))
+                            .values(last_morning_run=now_date)
+                        )
+                    if report_done:
+                        session.execute(
+                            update(UserScheduleSettings)
+                            .where(UserScheduleSettings.user_id.in_(report_done))
+                            .values(last_report_run=now_date)
+                        )
 
         except Exception as e:
             logger.error(f"Error checking reminder times: {e}", exc_info=True)
@@ -169,261 +389,343 @@ class SchedulerService:
         """
         logger.info("🔍 Checking pending payments")
         try:
-            from services.database_service import DatabaseService
-            from services.payment_service import payment_service
-            from services.telegram_service import telegram_service
-            from models import User, Subscription
-
-            db = DatabaseService()
-            with db.get_session() as session:
-                since = datetime.utcnow() - timedelta(hours=24)
+
+            with db_service.get_session() as session:
+                # um único timestamp por execução: janela de 24h e paid_at
+                now = datetime.utcnow()
+                since = now - timedelta(hours=24)
                 pendings = session.query(Subscription).filter(
                     Subscription.status == 'pending',
                     Subscription.created_at >= since
                 ).all()
 
+                # Consulta os status no gateway em paralelo (threads, o SDK é
+                # síncrono) e aplica cada resultado assim que chega, sobrepondo
+                # o trabalho no banco com as chamadas HTTP ainda em andamento.
+                # Usuários das assinaturas carregados de uma vez, indexados por id
+                user_ids = {sub.user_id for sub in pendings}
+                users_by_id = {
+                    u.id: u for u in session.query(User).filter(User.id.in_(user_ids))
+                } if user_ids else {}
+
                 approved = 0
-                for sub in pendings:
-                    st = payment_service.check_payment_status(sub.payment_id)
-                    if not st.get('success'):
-                        logger.warning(f"Payment {sub.payment_id} check failed: {st.get('error')}")
-                        continue
-
-                    status = st.get('status')
-                    if status == 'approved':
-                        approved += 1
-                        sub.status = 'approved'
-                        sub.paid_at = datetime.utcnow()
-                        sub.expires_at = datetime.utcnow() + timedelta(days=30)
-                        user = session.get(User, sub.user_id)
-                        if user:
-                            user.is_trial = False
-                            user.is_active = True
-                            user.last_payment_date = datetime.utcnow()
-                            user.next_due_date = sub.expires_at
-                        session.commit()
-                        # avisa no telegram (não bloqueia)
-                        msg = (
-                            f"✅ *Pagamento aprovado!*\n\n"
-                            f"Valor: R$ {sub.amount:.2f}\n"
-                            f"Próximo vencimento: {sub.expires_at.strftime('%d/%m/%Y')}"
-                        )
+                approved_subs = []
+                workers = max(1, min(app_settings.MAX_CONCURRENT_CONNECTIONS, len(pendings)))
+                pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='mp-status')
+                futures = {
+                    pool.submit(payment_service.check_payment_status, sub.payment_id): sub
+                    for sub in pendings
+                }
+                # Falha ou demora de uma consulta não derruba as demais: o que
+                # já foi aprovado é gravado e a expiração abaixo roda sempre
+                try:
+                    for future in as_completed(futures, timeout=120):
+                        sub = futures[future]
                         try:
-                            self._run_coro_blocking(telegram_service.send_message(user.telegram_id, msg), timeout=15)
+                            st = future.result()
                         except Exception as e:
-                            logger.error(f"Notify approved failed: {e}")
+                            logger.error(f"Payment {sub.payment_id} check raised: {e!r}")
+                            continue
+                        if not st.get('success'):
+                            logger.warning(f"Payment {sub.payment_id} check failed: {st.get('error')}")
+                            continue
+
+                        status = st.get('status')
+                        if status == 'approved':
+                            approved += 1
+                            sub.status = 'approved'
+                            paid_at = now
+                            sub.paid_at = paid_at
+                            sub.expires_at = paid_at + timedelta(days=30)
+                            user = users_by_id.get(sub.user_id)
+                            if user:
+                                user.is_trial = False
+                                user.is_active = True
+                                user.last_payment_date = paid_at
+                                user.next_due_date = sub.expires_at
+                            approved_subs.append((sub, user))
+                except FuturesTimeoutError:
+                    unfinished = sum(not f.done() for f in futures)
+                    logger.warning(f"{unfinished} payment checks unfinished after 120s; retrying next run")
+                finally:
+                    # Não espera consultas penduradas; as que nem começaram são descartadas
+                    pool.shutdown(wait=False, cancel_futures=True)
+
+                if approved_subs:
+                    session.commit()
+
+                # avisa no telegram em segundo plano, todos no mesmo gather;
+                # o job segue sem esperar a API do Telegram
+                notifications = [
+                    telegram_service.send_notification(
+                        user.telegram_id,
+                        _PAYMENT_APPROVED_MSG.format(
+                            amount=sub.amount, expires=_fmt_date(sub.expires_at)
+                        )
+                    )
+                    for sub, user in approved_subs if user
+                ]
+                if notifications:
+                    self._run_coro_background(
+                        self._gather(*notifications), 'Notify approved', timeout=30
+                    )
                 logger.info(f"Pending payments: {len(pendings)} | approved: {approved}")
 
                 # expira muito antigos
-                old = session.query(Subscription).filter(
+                expired = session.query(Subscription).filter(
                     Subscription.status == 'pending',
                     Subscription.created_at < since
-                ).all()
-                for sub in old:
-                    sub.status = 'expired'
-                if old:
-                    session.commit()
-                    logger.info(f"Expired old pendings: {len(old)}")
+                ).update({Subscription.status: 'expired'}, synchronize_session=False)
+                session.commit()
+                if expired:
+                    logger.info(f"Expired old pendings: {expired}")
 
         except Exception as e:
             logger.error(f"Error checking pending payments: {e}", exc_info=True)
 
+    async def _gather(self, *coros):
+        """Executa várias corrotinas no loop do scheduler; exceções voltam como resultado."""
+        return await asyncio.gather(*coros, return_exceptions=True)
+
+    async def _bounded(self, coro, sem):
+        """Roda a corrotina quando houver vaga no semáforo, com o timeout por usuário."""
+        try:
+            async with sem:
+                return await asyncio.wait_for(coro, _USER_JOB_TIMEOUT)
+        finally:
+            coro.close()  # cancelada ainda na fila: nunca chegou a rodar
+
+    def _run_jobs_blocking(self, coros):
+        """
+        Agenda cada corrotina no loop (no máximo _USER_JOB_CONCURRENCY ativas)
+        e espera até _TICK_JOBS_TIMEOUT pelo conjunto. Devolve um resultado por
+        corrotina, na ordem: o valor, a exceção levantada, ou FuturesTimeoutError
+        para as que não terminaram a tempo (essas são canceladas).
+        """
+        loop = self._get_event_loop()
+        sem = asyncio.Semaphore(_USER_JOB_CONCURRENCY)
+        futs = [asyncio.run_coroutine_threadsafe(self._bounded(c, sem), loop) for c in coros]
+        _, pending = futures_wait(futs, timeout=_TICK_JOBS_TIMEOUT)
+        for fut in pending:
+            fut.cancel()
+
+        results = []
+        for fut in futs:
+            if fut.cancelled():
+                results.append(FuturesTimeoutError(f"not finished within {_TICK_JOBS_TIMEOUT}s"))
+            else:
+                exc = fut.exception()
+                results.append(exc if exc is not None else fut.result())
+        return results
+
     def _check_due_dates(self):
         """
         Marca clientes vencidos como inativos.
         """
         try:
-            from services.database_service import DatabaseService
-            from models import Client
 
-            db = DatabaseService()
-            with db.get_session() as session:
+            with db_service.get_session() as session:
                 today = date.today()
-                overdue = session.query(Client).filter(
+                marked = session.query(Client).filter(
                     Client.due_date < today,
                     Client.status == 'active'
-                ).all()
-                for c in overdue:
-                    c.status = 'inactive'
-                if overdue:
-                    session.commit()
-                    logger.info(f"Marked inactive: {len(overdue)} clients")
+                ).update({Client.status: 'inactive'}, synchronize_session=False)
+                session.commit()
+                if marked:
+                    logger.info(f"Marked inactive: {marked} clients")
         except Exception as e:
             logger.error(f"Error checking due dates: {e}", exc_info=True)
 
     # ------------------- Corotinas (DEVEM EXISTIR) -------------------
 
-    async def _process_daily_reminders_for_user(self, user_id: int):
+    async def _process_daily_reminders_for_user(self, user_id: int) -> bool:
         """
         Envia para UM usuário todos os lembretes do dia:
         - D+2, D+1, D0, D-1 (após vencimento)
-        Reaproveita _send_reminders_by_type.
+        Em três fases, sem sessão aberta durante o envio: leitura curta ->
+        um POST em lote para o gateway -> INSERT curto dos logs.
+        Retorna True quando o dia do usuário foi processado e False se um
+        lote anterior ainda está em envio; erros sobem para o chamador, que
+        então não marca o dia como feito.
         """
-        from services.database_service import DatabaseService
-        from services.whatsapp_service import whatsapp_service
-        from models import User, Client
 
-        db = DatabaseService()
-        today = date.today()
+        if user_id in self._reminders_in_flight:
+            logger.info("Reminders for user=%s still being sent; skipping this tick", user_id)
+            return False
 
-        def q(session, delta, status='active'):
-            return session.query(Client).filter_by(
-                user_id=user_id,
-                status=status,
-            ).filter(Client.due_date == (today + timedelta(days=delta))).all()
+        today = datetime.now(self._tz).date()  # mesmo dia (fuso do bot) usado pelo tick
 
-        try:
-            with db.get_session() as session:
-                user = session.query(User).filter_by(id=user_id, is_active=True).first()
-                if not user:
-                    logger.info(f"User {user_id} not found/ inactive")
-                    return
-
-                c2 = q(session, 2)
-                c1 = q(session, 1)
-                c0 = q(session, 0)
-                c_1 = session.query(Client).filter_by(
-                    user_id=user_id,
-                    status='active'
-                ).filter(Client.due_date == (today - timedelta(days=1))).all()
-
-                if c2:
-                    await self._send_reminders_by_type(session, user, c2, 'reminder_2_days', whatsapp_service)
-                if c1:
-                    await self._send_reminders_by_type(session, user, c1, 'reminder_1_day', whatsapp_service)
-                if c0:
-                    await self._send_reminders_by_type(session, user, c0, 'reminder_due_date', whatsapp_service)
-                if c_1:
-                    await self._send_reminders_by_type(session, user, c_1, 'reminder_overdue', whatsapp_service)
-
-        except Exception as e:
-            logger.error(f"Error processing daily reminders for user {user_id}: {e}", exc_info=True)
+        # due_date -> tipo de lembrete (D+2, D+1, D0, D-1)
+        types_by_due = {
+            today + timedelta(days=d): reminder_type
+            for d, reminder_type in _REMINDER_TYPES_BY_OFFSET
+        }
 
-    async def _process_user_notifications_for_user(self, user_id: int):
+        # ---- Fase 1: leitura (tuplas simples, nada de ORM fora da sessão)
+        with db_service.get_session(isolated=True) as session:
+            if not session.query(User.id).filter_by(id=user_id, is_active=True).first():
+                logger.info("User %s not found/ inactive", user_id)
+                return True
+
+            templates = self._get_active_templates(session, user_id)
+
+            # Uma única consulta para as quatro datas
+            clients = session.query(
+                Client.id, Client.name, Client.plan_name, Client.plan_price,
+                Client.due_date, Client.server, Client.other_info, Client.phone_number,
+            ).filter(
+                Client.user_id == user_id,
+                Client.status == 'active',
+                Client.due_date.in_(list(types_by_due)),
+            ).all()
+
+            # evita duplicidade diária: um SELECT traz todos os clientes já
+            # atendidos hoje, por tipo
+            sent_today = set(session.query(MessageLog.template_type, MessageLog.client_id).filter(
+                MessageLog.user_id == user_id,
+                MessageLog.template_type.in_(list(types_by_due.values())),
+                MessageLog.status == 'sent',
+                MessageLog.sent_at >= datetime.combine(today, datetime.min.time()),
+            ))
+
+        to_send = []  # (tipo, cliente, mensagem)
+        for c in clients:
+            reminder_type = types_by_due[c.due_date]
+            content = templates.get(reminder_type)
+            if content is None:
+                logger.info("No template for %s user=%s", reminder_type, user_id)
+            elif (reminder_type, c.id) not in sent_today:
+                to_send.append((reminder_type, c, self._fill_template(content, c)))
+        if not to_send:
+            return True
+
+        # Envio + log protegidos do cancelamento: uma vez disparado o lote, os
+        # logs precisam ser gravados para o próximo tick não reenviar. Até lá
+        # o usuário fica em _reminders_in_flight.
+        self._reminders_in_flight.add(user_id)
+        task = asyncio.ensure_future(self._send_and_log_reminders(user_id, to_send))
+        task.add_done_callback(lambda _: self._reminders_in_flight.discard(user_id))
+        return await asyncio.shield(task)
+
+    async def _send_and_log_reminders(self, user_id: int, to_send) -> bool:
+        """Fases 2 e 3 dos lembretes diários: POST em lote e INSERT dos logs."""
+
+        # ---- Fase 2: um único POST em lote para o gateway; o HTTP bloqueante
+        # roda em thread para não travar o event loop
+        results = await asyncio.to_thread(
+            whatsapp_service.send_message_batch,
+            user_id,
+            [{'number': c.phone_number, 'message': message} for _, c, message in to_send],
+        )
+
+        # ---- Fase 3: logs gravados com um único INSERT multi-linha (Core)
+        sent_at = datetime.utcnow()
+        rows = []
+        for (reminder_type, c, message), res in zip(to_send, results):
+            ok = bool(res.get('success'))
+            rows.append({
+                'user_id': user_id,
+                'client_id': c.id,
+                'template_type': reminder_type,
+                'message_content': message,
+                'recipient_phone': c.phone_number,
+                'sent_at': sent_at,
+                'status': 'sent' if ok else 'failed',
+                'error_message': None if ok else (res.get('error') or 'send failed'),
+            })
+        with db_service.get_session(isolated=True) as session:
+            session.execute(insert(MessageLog), rows)
+        return True
+
+    async def _process_user_notifications_for_user(self, user_id: int) -> bool:
         """
         Monta e envia o relatório diário (overdue, hoje, +1, +2) para UM usuário via Telegram.
+        A leitura fecha a sessão antes do envio. Retorna True quando não há
+        nada a enviar ou o Telegram aceitou a mensagem.
         """
-        from services.database_service import DatabaseService
-        from services.telegram_service import telegram_service
-        from models import User, Client
 
-        db = DatabaseService()
-        today = date.today()
+        today = datetime.now(self._tz).date()  # mesmo dia (fuso do bot) usado pelo tick
         t1 = today + timedelta(days=1)
         t2 = today + timedelta(days=2)
 
-        try:
-            with db.get_session() as session:
-                user = session.query(User).filter_by(id=user_id, is_active=True).first()
-                if not user:
-                    return
-                clis = session.query(Client).filter_by(user_id=user.id).all()
-                overdue = [c for c in clis if c.due_date < today and c.status == 'active']
-                d0 = [c for c in clis if c.due_date == today and c.status == 'active']
-                d1 = [c for c in clis if c.due_date == t1 and c.status == 'active']
-                d2 = [c for c in clis if c.due_date == t2 and c.status == 'active']
-                if not (overdue or d0 or d1 or d2):
-                    return
-                text = self._build_notification_message(overdue, d0, d1, d2)
-                await telegram_service.send_notification(user.telegram_id, text)
-        except Exception as e:
-            logger.error(f"Error processing daily notifications for user {user_id}: {e}", exc_info=True)
+        with db_service.get_session(isolated=True) as session:
+            row = session.query(User.telegram_id).filter_by(id=user_id, is_active=True).first()
+            if not row:
+                return True
+            telegram_id = row[0]
+            # Só as colunas usadas no relatório e só clientes relevantes
+            # (vencidos ou vencendo em até 2 dias), já ordenados por data.
+            # Um único intervalo em due_date vira um range scan no índice
+            # (user_id, status, due_date).
+            clis = session.query(Client.due_date, Client.name, Client.plan_price).filter(
+                Client.user_id == user_id,
+                Client.status == 'active',
+                Client.due_date <= t2
+            ).order_by(Client.due_date).all()
+
+        overdue, d0, d1, d2 = [], [], [], []
+        buckets = {today: d0, t1: d1, t2: d2}
+        for c in clis:
+            (overdue if c.due_date < today else buckets[c.due_date]).append(c)
+        if not (overdue or d0 or d1 or d2):
+            return True
+        text = self._build_notification_message(overdue, d0, d1, d2)
+        return await telegram_service.send_notification(telegram_id, text)
 
     # ------------------- Auxiliares de envio -------------------
 
     def _build_notification_message(self, overdue, due_today, due_tomorrow, due_day_after):
-        msg = "📅 *Relatório Diário de Vencimentos*\n\n"
-        def price(c): 
-            try: return f"R$ {float(c.plan_price or 0):.2f}".replace('.', ',')
-            except: return "N/A"
+        parts = [_REPORT_HEADER]
         if overdue:
-            msg += f"🔴 *{len(overdue)} em atraso:*\n"
-            for c in overdue[:5]:
-                days = (date.today() - c.due_date).days
-                msg += f"• {c.name} - {days} dia(s)\n"
-            if len(overdue) > 5: msg += f"• … e mais {len(overdue)-5}\n"
-            msg += "\n"
-        if due_today:
-            msg += f"🟡 *{len(due_today)} vencem hoje:*\n"
-            for c in due_today[:5]: msg += f"• {c.name} - {price(c)}\n"
-            if len(due_today) > 5: msg += f"• … e mais {len(due_today)-5}\n"
-            msg += "\n"
-        if due_tomorrow:
-            msg += f"🟠 *{len(due_tomorrow)} vencem amanhã:*\n"
-            for c in due_tomorrow[:5]: msg += f"• {c.name} - {price(c)}\n"
-            if len(due_tomorrow) > 5: msg += f"• … e mais {len(due_tomorrow)-5}\n"
-            msg += "\n"
-        if due_day_after:
-            msg += f"🔵 *{len(due_day_after)} vencem em 2 dias:*\n"
-            for c in due_day_after[:5]: msg += f"• {c.name} - {price(c)}\n"
-            if len(due_day_after) > 5: msg += f"• … e mais {len(due_day_after)-5}\n"
-            msg += "\n"
-        msg += "📱 Use *👥 Clientes* para gerenciar."
-        return msg
-
-    async def _send_reminders_by_type(self, session, user, clients, reminder_type, whatsapp_service):
+            today = datetime.now(self._tz).date()
+            parts.append(f"🔴 *{len(overdue)} em atraso:*\n")
+            parts.extend(f"• {c.name} - {(today - c.due_date).days} dia(s)\n" for c in overdue[:5])
+            if len(overdue) > 5: parts.append(f"• … e mais {len(overdue)-5}\n")
+            parts.append("\n")
+        for header, clients in zip(_REPORT_SECTION_HEADERS, (due_today, due_tomorrow, due_day_after)):
+            if not clients:
+                continue
+            parts.append(header.format(len(clients)))
+            parts.extend(f"• {c.name} - {_fmt_price(c)}\n" for c in clients[:5])
+            if len(clients) > 5: parts.append(f"• … e mais {len(clients)-5}\n")
+            parts.append("\n")
+        parts.append(_REPORT_FOOTER)
+        return ''.join(parts)
+
+    def _get_active_templates(self, session, user_id):
         """
-        Envia mensagens via WhatsApp usando o template do usuário para o tipo informado.
-        Loga sucesso/erro por cliente.
+        Templates ativos do usuário como {template_type: conteúdo}, em cache
+        (TTL de 5 min do query_cache). Uma consulta cobre os quatro tipos de
+        lembrete; edições de template invalidam a entrada.
         """
-        from models import MessageTemplate, MessageLog
-        from datetime import datetime as dt
 
-        try:
-            template = session.query(MessageTemplate).filter_by(
-                user_id=user.id,
-                template_type=reminder_type,
-                is_active=True
-            ).first()
-            if not template:
-                logger.info(f"No template for {reminder_type} user={user.id}")
-                return
-
-            today = date.today()
-            for c in clients:
-                # evita duplicidade diária
-                exists = session.query(MessageLog).filter_by(
-                    user_id=user.id, client_id=c.id, template_id=template.id, status='sent'
-                ).filter(MessageLog.sent_at >= dt.combine(today, dt.min.time())).first()
-                if exists:
-                    continue
-
-                content = self._fill_template(template.content, c)
-                res = whatsapp_service.send_message(c.phone_number, content)
-                ok = bool(res.get('success'))
-                log = MessageLog(
-                    user_id=user.id,
-                    client_id=c.id,
-                    template_id=template.id,
-                    message_content=content,
-                    recipient_phone=c.phone_number,
-                    sent_at=dt.utcnow(),
-                    status='sent' if ok else 'failed',
-                    error_message=None if ok else (res.get('error') or 'send failed')
-                )
-                session.add(log)
-
-            session.commit()
-        except Exception as e:
-            logger.error(f"Error sending '{reminder_type}' reminders: {e}", exc_info=True)
+        templates = query_cache.get_templates_for_user(user_id)
+        if templates is None:
+            templates = {}
+            for template_type, content in session.query(
+                MessageTemplate.template_type, MessageTemplate.content
+            ).filter(
+                MessageTemplate.user_id == user_id,
+                MessageTemplate.is_active.is_(True),
+            ).order_by(MessageTemplate.id):
+                templates.setdefault(template_type, content)
+            query_cache.set_templates_for_user(user_id, templates)
+        return templates
 
     def _fill_template(self, tpl: str, c) -> str:
         def as_money(v):
-            try: return f"{float(v or 0):.2f}".replace('.', ',')
+            try: return format(float(v or 0), '.2f').translate(_MONEY_TABLE)
             except: return "0,00"
         rep = {
             '{nome}': c.name or 'Cliente',
             '{plano}': (getattr(c, 'plan_name', None) or 'Plano'),
             '{valor}': as_money(getattr(c, 'plan_price', 0)),
-            '{vencimento}': (c.due_date.strftime('%d/%m/%Y') if getattr(c, 'due_date', None) else ''),
+            '{vencimento}': (_fmt_date(c.due_date) if getattr(c, 'due_date', None) else ''),
             '{servidor}': getattr(c, 'server', None) or '—',
             '{informacoes_extras}': getattr(c, 'other_info', None) or ''
         }
-        out = (tpl or '').strip()
-        for k, v in rep.items():
-            out = out.replace(k, str(v))
-        while '\n\n\n' in out:
-            out = out.replace('\n\n\n', '\n\n')
+        out = _compile_template((tpl or '').strip())(rep)
+        out = _NEWLINE_RE.sub('\n\n', out)
         return out.strip()
 
 
@@ -5,13 +5,13 @@ from telegram.error import TelegramError, BadRequest, Forbidden
 from telegram.constants import ParseMode
 from services.database_service import db_service
 from models import User
-from config import Config
+from config import settings
 
 logger = logging.getLogger(__name__)
 
 class TelegramService:
     def __init__(self):
-        self.bot = Bot(token=Config.TELEGRAM_BOT_TOKEN)
+        self.bot = Bot(token=settings.TELEGRAM_BOT_TOKEN)
     
     async def send_notification(self, user_telegram_id: str, message: str, 
                               reply_markup: InlineKeyboardMarkup = None,
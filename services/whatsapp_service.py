@@ -1,14 +1,22 @@
+import atexit
 import requests
 import logging
-from typing import Dict, Any
+import os
+import re
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, Any, List
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 logger = logging.getLogger(__name__)
 
+_NON_DIGITS_RE = re.compile(r'\D+')
+
 class WhatsAppService:
     def __init__(self):
         # Support Railway environment with internal service communication
-        import os
-        
         # Check for Railway environment variables
         railway_environment = os.getenv('RAILWAY_ENVIRONMENT_NAME')
         whatsapp_url = os.getenv('WHATSAPP_SERVICE_URL')
@@ -26,17 +34,47 @@ class WhatsAppService:
         self.headers = {
             'Content-Type': 'application/json'
         }
+        
+        # Pooled keep-alive session shared by all calls (thread-safe for the
+        # scheduler's concurrent sends). Retries cover dropped connections and
+        # gateway 5xx; POSTs are only retried when the request never went out.
+        self._session = requests.Session()
+        self._session.headers.update(self.headers)
+        adapter = HTTPAdapter(
+            pool_connections=32,
+            pool_maxsize=64,
+            max_retries=Retry(total=2, backoff_factor=0.3,
+                              status_forcelist=[502, 503, 504], raise_on_status=False)
+        )
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+        
+        # A send to a disconnected session triggers a restore; remember recent
+        # attempts per user so a burst of failed sends restores only once per TTL.
+        self._restore_ttl = int(os.getenv('WHATSAPP_RESTORE_TTL', '60'))
+        self._restore_after: Dict[int, float] = {}
+        self._restore_lock = threading.Lock()
+        
+        # Short-lived status cache with one lock per user (single-flight).
+        # Locks are [lock, callers] entries dropped when the last caller leaves,
+        # so the dict only holds users with a status check in progress.
+        self._status_ttl = float(os.getenv('WHATSAPP_STATUS_TTL', '1'))
+        self._status_cache: Dict[int, tuple] = {}
+        self._status_locks: Dict[int, list] = {}
+        self._status_locks_guard = threading.Lock()
+        atexit.register(self.close)
         logger.info(f"WhatsApp Service initialized with URL: {self.baileys_url}")
     
+    def close(self) -> None:
+        """Close pooled connections to the Baileys server"""
+        self._session.close()
+    
     def send_message(self, phone_number: str, message: str, user_id: int) -> Dict[str, Any]:
         """
         Send WhatsApp message via Baileys with auto-recovery
         """
         try:
-            # Format phone number (remove non-digits and ensure country code)
-            clean_phone = ''.join(filter(str.isdigit, phone_number))
-            if not clean_phone.startswith('55'):
-                clean_phone = '55' + clean_phone
+            clean_phone = self._clean_phone(phone_number)
             
             # Prepare payload for Baileys
             payload = {
@@ -47,19 +85,18 @@ class WhatsAppService:
             # Send to local Baileys server with user isolation
             url = f"{self.baileys_url}/send/{user_id}"
             
-            logger.info(f"Sending WhatsApp message to {clean_phone}")
+            logger.info("Sending WhatsApp message to %s", clean_phone)
             
-            response = requests.post(
+            response = self._session.post(
                 url,
                 json=payload,
-                headers=self.headers,
                 timeout=45  # Railway optimized timeout
             )
             
             if response.status_code == 200:
                 result = response.json()
                 if result.get('success'):
-                    logger.info(f"WhatsApp message sent successfully to {clean_phone}")
+                    logger.info("WhatsApp message sent successfully to %s", clean_phone)
                     return {
                         'success': True,
                         'message_id': result.get('messageId'),
@@ -71,10 +108,7 @@ class WhatsAppService:
                     
                     # Try to restore session if WhatsApp not connected
                     if 'não conectado' in error_msg.lower() or 'not connected' in error_msg.lower():
-                        logger.info(f"Attempting to restore WhatsApp session for user {user_id}")
-                        restore_result = self.restore_session(user_id)
-                        if restore_result.get('success'):
-                            logger.info(f"Session restore initiated for user {user_id}")
+                        self._restore_if_due(user_id)
                         
                     return {
                         'success': False,
@@ -111,16 +145,105 @@ class WhatsAppService:
                 'details': str(e)
             }
     
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def _clean_phone(phone_number: str) -> str:
+        """Format phone number (remove non-digits and ensure country code); cached per raw number"""
+        clean_phone = _NON_DIGITS_RE.sub('', phone_number or '')
+        if not clean_phone.startswith('55'):
+            clean_phone = '55' + clean_phone
+        return clean_phone
+    
+    def send_message_batch(self, user_id: int, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Send several messages for one user in a single request to Baileys.
+        Each item has 'number' and 'message'; returns one result dict per item, in order.
+        """
+        if not items:
+            return []
+        
+        messages = [
+            {'number': self._clean_phone(item['number']), 'message': item['message'], 'ref': i}
+            for i, item in enumerate(items)
+        ]
+        
+        def _all_failed(error: str, details: Any = None) -> List[Dict[str, Any]]:
+            return [{'success': False, 'error': error, 'details': details} for _ in items]
+        
+        try:
+            url = f"{self.baileys_url}/send-batch/{user_id}"
+            logger.info("Sending batch of %d WhatsApp messages for user %s", len(messages), user_id)
+            
+            response = self._session.post(
+                url,
+                json={'messages': messages},
+                timeout=45 + 5 * len(messages)
+            )
+            
+            if response.status_code == 404:
+                # Gateway without the batch endpoint: fall back to one request per message
+                return [self.send_message(item['number'], item['message'], user_id) for item in items]
+            
+            if response.status_code != 200:
+                logger.error(f"Failed to send WhatsApp batch: {response.status_code} - {response.text}")
+                return _all_failed(f"HTTP Error: {response.status_code}", response.text)
+            
+            result = response.json()
+            results = _all_failed(result.get('error', 'Missing result'))
+            for r in result.get('results', []):
+                ref = r.get('ref')
+                if isinstance(ref, int) and 0 <= ref < len(results):
+                    results[ref] = {
+                        'success': bool(r.get('success')),
+                        'message_id': r.get('messageId'),
+                        'error': r.get('error'),
+                    }
+            
+            if not result.get('success'):
+                error_msg = result.get('error', 'Unknown error')
+                logger.error(f"Failed to send WhatsApp batch: {error_msg}")
+                if 'não conectado' in error_msg.lower() or 'not connected' in error_msg.lower():
+                    self._restore_if_due(user_id)
+            
+            return results
+            
+        except requests.exceptions.Timeout:
+            logger.error("WhatsApp API timeout")
+            return _all_failed('Timeout', 'API request timed out')
+        except requests.exceptions.RequestException as e:
+            logger.error(f"WhatsApp API request error: {e}")
+            return _all_failed('Request failed', str(e))
+        except Exception as e:
+            logger.error(f"Unexpected error sending WhatsApp batch: {e}")
+            return _all_failed('Unexpected error', str(e))
+    
+    def _restore_if_due(self, user_id: int) -> None:
+        """Restore the user's session unless a restore was already attempted within the TTL"""
+        now = time.monotonic()
+        with self._restore_lock:
+            if now < self._restore_after.get(user_id, 0.0):
+                return
+            self._restore_after[user_id] = now + self._restore_ttl
+        
+        logger.info(f"Attempting to restore WhatsApp session for user {user_id}")
+        restore_result = self.restore_session(user_id)
+        if restore_result.get('success'):
+            logger.info(f"Session restore initiated for user {user_id}")
+        else:
+            # Let the next failed send try again instead of waiting out the TTL
+            with self._restore_lock:
+                self._restore_after.pop(user_id, None)
+    
     def restore_session(self, user_id: int) -> Dict[str, Any]:
         """
         Attempt to restore WhatsApp session for user
         """
+        self._invalidate_status(user_id)
         try:
             url = f"{self.baileys_url}/restore/{user_id}"
             
-            response = requests.post(
+            response = self._session.post(
                 url,
-                headers=self.headers,
                 timeout=30  # Railway optimized timeout
             )
             
@@ -150,9 +273,8 @@ class WhatsAppService:
         try:
             url = f"{self.baileys_url}/health"
             
-            response = requests.get(
+            response = self._session.get(
                 url,
-                headers=self.headers,
                 timeout=20  # Railway optimized timeout
             )
             
@@ -175,14 +297,44 @@ class WhatsAppService:
     
     def check_instance_status(self, user_id: int) -> Dict[str, Any]:
         """
-        Check if WhatsApp instance is connected and ready
+        Check if WhatsApp instance is connected and ready.
+        Concurrent calls for the same user share one request, and a successful
+        result is reused for WHATSAPP_STATUS_TTL seconds.
         """
+        with self._status_locks_guard:
+            entry = self._status_locks.get(user_id)
+            if entry is None:
+                entry = self._status_locks[user_id] = [threading.Lock(), 0]
+            entry[1] += 1
+        
+        try:
+            with entry[0]:
+                cached = self._status_cache.get(user_id)
+                if cached and time.monotonic() - cached[0] < self._status_ttl:
+                    return cached[1]
+                
+                result = self._fetch_instance_status(user_id)
+                if result.get('success'):
+                    self._status_cache[user_id] = (time.monotonic(), result)
+                else:
+                    self._status_cache.pop(user_id, None)
+                return result
+        finally:
+            with self._status_locks_guard:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._status_locks[user_id]
+    
+    def _invalidate_status(self, user_id: int) -> None:
+        """Drop the cached status after an action that changes the session state"""
+        self._status_cache.pop(user_id, None)
+    
+    def _fetch_instance_status(self, user_id: int) -> Dict[str, Any]:
         try:
             url = f"{self.baileys_url}/status/{user_id}"
             
-            response = requests.get(
+            response = self._session.get(
                 url,
-                headers=self.headers,
                 timeout=20  # Railway optimized timeout
             )
             
@@ -195,9 +347,9 @@ class WhatsAppService:
                 
                 # Log connection status for debugging
                 if connected:
-                    logger.info(f"WhatsApp status for user {user_id}: connected={connected}, state={state}")
+                    logger.info("WhatsApp status for user %s: connected=%s, state=%s", user_id, connected, state)
                 else:
-                    logger.warning(f"WhatsApp status for user {user_id}: connected={connected}, state={state}")
+                    logger.warning("WhatsApp status for user %s: connected=%s, state=%s", user_id, connected, state)
                 
                 return {
                     'success': True,
@@ -232,6 +384,7 @@ class WhatsAppService:
         """
         Request pairing code for WhatsApp connection
         """
+        self._invalidate_status(user_id)
         try:
             url = f"{self.baileys_url}/pairing-code/{user_id}"
             
@@ -241,10 +394,9 @@ class WhatsAppService:
             
             logger.info(f"Requesting pairing code for user {user_id} with phone {phone_number}")
             
-            response = requests.post(
+            response = self._session.post(
                 url,
                 json=payload,
-                headers=self.headers,
                 timeout=45  # Railway optimized timeout
             )
             
@@ -293,9 +445,8 @@ class WhatsAppService:
         try:
             url = f"{self.baileys_url}/pairing-code/{user_id}"
             
-            response = requests.get(
+            response = self._session.get(
                 url,
-                headers=self.headers,
                 timeout=20  # Railway optimized timeout
             )
             
@@ -319,59 +470,41 @@ class WhatsAppService:
     
     def get_qr_code(self, user_id: int) -> Dict[str, Any]:
         """
-        Get QR code for WhatsApp connection - Uses status endpoint
+        Get QR code for WhatsApp connection - reads it from the (coalesced) status call
         """
-        try:
-            # Use status endpoint instead of non-existent /qr endpoint
-            url = f"{self.baileys_url}/status/{user_id}"
-            
-            response = requests.get(
-                url,
-                headers=self.headers,
-                timeout=20  # Railway optimized timeout
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                # Extract QR code from status response
-                if result.get('success') and result.get('qrCode'):
-                    return {
-                        'success': True,
-                        'qrCode': result.get('qrCode'),
-                        'state': result.get('state'),
-                        'connected': result.get('connected')
-                    }
-                else:
-                    return {
-                        'success': False,
-                        'error': 'QR Code not available in status',
-                        'details': result
-                    }
-            else:
-                return {
-                    'success': False,
-                    'error': f"HTTP Error: {response.status_code}",
-                    'details': response.text
-                }
-                
-        except Exception as e:
-            logger.error(f"Error getting QR code: {e}")
+        status = self.check_instance_status(user_id)
+        if not status.get('success'):
             return {
                 'success': False,
-                'error': 'QR code fetch failed',
-                'details': str(e)
+                'error': status.get('error', 'QR code fetch failed'),
+                'details': status.get('details')
             }
+        
+        result = status.get('response') or {}
+        # Extract QR code from status response
+        if result.get('success') and result.get('qrCode'):
+            return {
+                'success': True,
+                'qrCode': result.get('qrCode'),
+                'state': result.get('state'),
+                'connected': result.get('connected')
+            }
+        return {
+            'success': False,
+            'error': 'QR Code not available in status',
+            'details': result
+        }
     
     def disconnect_whatsapp(self, user_id: int) -> Dict[str, Any]:
         """
         Disconnect WhatsApp
         """
+        self._invalidate_status(user_id)
         try:
             url = f"{self.baileys_url}/disconnect/{user_id}"
             
-            response = requests.post(
+            response = self._session.post(
                 url,
-                headers=self.headers,
                 timeout=20  # Railway optimized timeout
             )
             
@@ -397,12 +530,12 @@ class WhatsAppService:
         """
         Reconnect WhatsApp
         """
+        self._invalidate_status(user_id)
         try:
             url = f"{self.baileys_url}/reconnect/{user_id}"
             
-            response = requests.post(
+            response = self._session.post(
                 url,
-                headers=self.headers,
                 timeout=20  # Railway optimized timeout
             )
             
@@ -428,12 +561,12 @@ class WhatsAppService:
         """
         Force generate a new QR code - GUARANTEED to work
         """
+        self._invalidate_status(user_id)
         try:
             url = f"{self.baileys_url}/force-qr/{user_id}"
             
-            response = requests.post(
+            response = self._session.post(
                 url,
-                headers=self.headers,
                 timeout=45  # Railway optimized timeout
             )
             
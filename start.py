@@ -4,18 +4,37 @@ Railway Start Script - Telegram Bot + WhatsApp Multi-User
 Optimized for production deployment
 """
 
+import atexit
+import importlib
 import os
 import sys
 import time
 import signal
 import subprocess
 import threading
+import urllib.request
 from pathlib import Path
 
 # Environment setup
 os.environ.setdefault('PYTHONPATH', '/app')
 os.environ.setdefault('NODE_ENV', 'production')
 
+# Node child process; stopped together with this script
+whatsapp_process = None
+
+def stop_whatsapp_service():
+    """Send SIGTERM to the WhatsApp process group, escalating to SIGKILL after 5s"""
+    process = whatsapp_process
+    if process is None or process.poll() is not None:
+        return
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(timeout=5)
+    except subprocess.TimeoutExpired:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
 def start_whatsapp_service():
     """Start WhatsApp Baileys Multi-User service"""
     try:
@@ -25,32 +44,54 @@ def start_whatsapp_service():
         sessions_dir = Path('./sessions')
         sessions_dir.mkdir(exist_ok=True)
         
-        # Start WhatsApp service
-        process = subprocess.Popen(
-            ['node', 'whatsapp_baileys_multi.js'],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            universal_newlines=True,
-            bufsize=1
-        )
+        # Start WhatsApp service; it inherits our stdout/stderr and writes
+        # straight to the container log (no Python thread pumping lines)
+        # Own process group so shutdown signals reach node and anything it spawns
+        global whatsapp_process
+        process = subprocess.Popen(['node', 'whatsapp_baileys_multi.js'], start_new_session=True)
+        whatsapp_process = process
+        # Also covers the bot's own signal handling (run_polling) ending the process
+        atexit.register(stop_whatsapp_service)
         
-        # Forward output
-        for line in iter(process.stdout.readline, ''):
-            print(f"[WhatsApp] {line.strip()}")
-            
         return process
         
     except Exception as e:
         print(f"❌ Error starting WhatsApp service: {e}")
         return None
 
-def start_telegram_bot():
+def wait_for_whatsapp(url='http://127.0.0.1:3001/health', max_wait=15):
+    """Poll the WhatsApp health endpoint with backoff until it answers 2xx"""
+    delay = 0.025
+    deadline = time.monotonic() + max_wait
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if 200 <= response.status < 300:
+                    return True
+        except OSError:
+            pass
+        time.sleep(delay)
+        delay = min(delay * 2, 1.0)
+    return False
+
+def preload_bot():
+    """Import the bot module in the background while the WhatsApp service boots"""
+    thread = threading.Thread(target=importlib.import_module, args=('main',), daemon=True)
+    thread.start()
+    return thread
+
+def start_telegram_bot(preload_thread=None):
     """Start Telegram Bot service"""
     try:
         print("🤖 Starting Telegram Bot service...")
         
-        # Import and run the bot
-        import main
+        # Reuse the preloaded module; importing again re-raises any import error here
+        if preload_thread:
+            preload_thread.join()
+        bot = sys.modules.get('main') or importlib.import_module('main')
+        
+        # Run the bot (main.py only starts itself under __main__)
+        bot.main()
         
     except Exception as e:
         print(f"❌ Error starting Telegram Bot: {e}")
@@ -59,6 +100,7 @@ def start_telegram_bot():
 def signal_handler(signum, frame):
     """Handle graceful shutdown"""
     print("🛑 Received shutdown signal, cleaning up...")
+    stop_whatsapp_service()
     sys.exit(0)
 
 def main():
@@ -87,15 +129,20 @@ def main():
         print(f"❌ Missing required environment variables: {', '.join(missing_vars)}")
         sys.exit(1)
     
-    # Start WhatsApp service in background thread
-    whatsapp_thread = threading.Thread(target=start_whatsapp_service, daemon=True)
-    whatsapp_thread.start()
+    # Start WhatsApp service (runs as a child process)
+    start_whatsapp_service()
+    
+    # Overlap the bot's import cost with the WhatsApp boot
+    preload_thread = preload_bot()
     
-    # Give WhatsApp service time to start
-    time.sleep(3)
+    # Wait until the WhatsApp service answers instead of a fixed delay
+    if wait_for_whatsapp():
+        print("✅ WhatsApp service is ready")
+    else:
+        print("⚠️ WhatsApp service not ready yet, starting bot anyway")
     
     # Start Telegram bot (main process)
-    start_telegram_bot()
+    start_telegram_bot(preload_thread)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
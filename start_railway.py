@@ -5,7 +5,6 @@ Gerencia tanto o bot Telegram quanto o servidor WhatsApp
 """
 import os
 import sys
-import threading
 import subprocess
 import time
 import signal
@@ -38,25 +37,12 @@ class RailwayStarter:
             if not os.getenv('WHATSAPP_SERVICE_URL'):
                 env['WHATSAPP_SERVICE_URL'] = 'http://127.0.0.1:3001'
             
-            process = subprocess.Popen(
-                cmd,
-                env=env,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                universal_newlines=True,
-                bufsize=1
-            )
+            # Child inherits stdout/stderr and writes straight to the
+            # container log; no Python thread re-logging each line
+            process = subprocess.Popen(cmd, env=env)
             
             self.processes.append(('whatsapp', process))
             
-            # Log output in separate thread
-            def log_output():
-                if process.stdout:
-                    for line in process.stdout:
-                        logger.info(f"[WhatsApp] {line.strip()}")
-                    
-            threading.Thread(target=log_output, daemon=True).start()
-            
             return process
             
         except Exception as e:
@@ -66,21 +52,24 @@ class RailwayStarter:
     def start_telegram_bot(self):
         """Start Telegram bot"""
         try:
-            # Wait for WhatsApp server to be ready
+            # Wait for WhatsApp server to be ready: poll /health with backoff
+            # (25ms → 1s) instead of a fixed 10s sleep
             logger.info("⏳ Waiting for WhatsApp server to be ready...")
-            time.sleep(10)
-            
-            # Test if WhatsApp server is responding
             import requests
-            for attempt in range(5):
+            delay = 0.025
+            deadline = time.monotonic() + 45
+            while time.monotonic() < deadline:
                 try:
-                    response = requests.get('http://127.0.0.1:3001/health', timeout=5)
+                    response = requests.get('http://127.0.0.1:3001/health', timeout=1)
                     if response.status_code == 200:
                         logger.info("✅ WhatsApp server is ready!")
                         break
-                except:
-                    logger.info(f"⏳ WhatsApp server not ready, attempt {attempt + 1}/5")
-                    time.sleep(3)
+                except requests.RequestException:
+                    pass
+                time.sleep(delay)
+                delay = min(delay * 2, 1.0)
+            else:
+                logger.warning("⚠️ WhatsApp server not ready, starting Telegram bot anyway")
             
             logger.info("🤖 Starting Telegram bot...")
             cmd = ["python", "main.py"]
@@ -90,25 +79,12 @@ class RailwayStarter:
             env['RAILWAY_ENVIRONMENT_NAME'] = os.getenv('RAILWAY_ENVIRONMENT_NAME', 'production')
             env['WHATSAPP_SERVICE_URL'] = 'http://127.0.0.1:3001'
             
-            process = subprocess.Popen(
-                cmd,
-                env=env,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                universal_newlines=True,
-                bufsize=1
-            )
+            # Child inherits stdout/stderr and writes straight to the
+            # container log; no Python thread re-logging each line
+            process = subprocess.Popen(cmd, env=env)
             
             self.processes.append(('telegram', process))
             
-            # Log output in separate thread
-            def log_output():
-                if process.stdout:
-                    for line in process.stdout:
-                        logger.info(f"[Telegram] {line.strip()}")
-                    
-            threading.Thread(target=log_output, daemon=True).start()
-            
             return process
             
         except Exception as e:
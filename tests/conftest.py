@@ -3,16 +3,19 @@ Test Configuration and Fixtures
 Provides shared test configuration and fixtures
 """
 import pytest
-import asyncio
 import tempfile
 import os
-from unittest.mock import Mock, AsyncMock
+from types import SimpleNamespace
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
 # Test configuration
 TEST_DATABASE_URL = "sqlite:///:memory:"
 
+# Service modules build their engine from DATABASE_URL at import time; point
+# them at a throwaway SQLite file instead of the production default
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "app.db"))
+
 @pytest.fixture
 def temp_file():
     """Create temporary file for testing"""
@@ -23,39 +26,44 @@ def temp_file():
 @pytest.fixture
 def mock_telegram_update():
     """Mock Telegram update object"""
-    update = Mock()
-    update.effective_user = Mock()
-    update.effective_user.id = 12345
-    update.effective_user.first_name = "Test User"
-    update.effective_chat = Mock()
-    update.effective_chat.id = 12345
-    update.message = Mock()
-    update.message.text = "Test message"
-    return update
+    return SimpleNamespace(
+        effective_user=SimpleNamespace(id=12345, first_name="Test User"),
+        effective_chat=SimpleNamespace(id=12345),
+        message=SimpleNamespace(text="Test message"),
+    )
 
 @pytest.fixture
 def mock_telegram_context():
     """Mock Telegram context object"""
-    context = Mock()
-    context.user_data = {}
-    context.chat_data = {}
-    context.bot_data = {}
-    return context
+    return SimpleNamespace(user_data={}, chat_data={}, bot_data={})
 
-@pytest.fixture
-def test_database():
-    """Create test database"""
+@pytest.fixture(scope="session")
+def test_engine():
+    """Create the test database schema once per test session"""
     engine = create_engine(TEST_DATABASE_URL)
-    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
     
     # Import and create tables
     from models import Base
     Base.metadata.create_all(bind=engine)
     
-    yield TestingSessionLocal
+    yield engine
     
     # Cleanup
     Base.metadata.drop_all(bind=engine)
+    engine.dispose()
+
+@pytest.fixture
+def test_database(test_engine):
+    """Session factory bound to a per-test transaction that is rolled back afterwards"""
+    connection = test_engine.connect()
+    transaction = connection.begin()
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=connection)
+    
+    yield TestingSessionLocal
+    
+    # Undo everything the test wrote, including its commits
+    transaction.rollback()
+    connection.close()
 
 @pytest.fixture
 def sample_user_data():
@@ -84,35 +92,38 @@ def sample_client_data():
     }
 
 @pytest.fixture
-def event_loop():
-    """Create event loop for async tests"""
-    loop = asyncio.new_event_loop()
-    yield loop
-    loop.close()
-
-@pytest.fixture(autouse=True)
-def reset_caches():
-    """Reset all caches before each test"""
+def caches_reset():
+    """Reset all caches before a test that uses them"""
     from core.cache import cache_manager, query_cache, session_cache
     cache_manager.clear_all()
     query_cache.cache.clear()
     session_cache.cache.clear()
 
-@pytest.fixture(autouse=True)
-def reset_metrics():
-    """Reset monitoring metrics before each test"""
+@pytest.fixture
+def metrics_reset():
+    """Reset monitoring metrics before a test that uses them"""
     from core.monitoring import monitoring
     monitoring.metrics._metrics.clear()
     monitoring.metrics._counters.clear()
     monitoring.metrics._gauges.clear()
     monitoring.metrics._histograms.clear()
 
+class _StubWhatsAppService:
+    """Minimal WhatsApp service stand-in"""
+    
+    async def send_message(self, *args, **kwargs):
+        return True
+    
+    async def connect_user(self, *args, **kwargs):
+        return True
+    
+    async def disconnect_user(self, *args, **kwargs):
+        return True
+    
+    def get_connection_status(self, *args, **kwargs):
+        return {'connected': True}
+
 @pytest.fixture
 def mock_whatsapp_service():
     """Mock WhatsApp service"""
-    service = Mock()
-    service.send_message = AsyncMock(return_value=True)
-    service.connect_user = AsyncMock(return_value=True)
-    service.disconnect_user = AsyncMock(return_value=True)
-    service.get_connection_status = Mock(return_value={'connected': True})
-    return service
\ No newline at end of file
+    return _StubWhatsAppService()
\ No newline at end of file
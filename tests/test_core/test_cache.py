@@ -2,13 +2,13 @@
 Tests for core caching system
 """
 import pytest
-import time
 from unittest.mock import patch
 from core.cache import (
     LRUCache, CacheManager, cached, query_cache, 
     session_cache, make_cache_key
 )
 
+@pytest.mark.usefixtures("caches_reset")
 class TestLRUCache:
     """Test LRU cache implementation"""
     
@@ -39,11 +39,13 @@ class TestLRUCache:
     def test_ttl_expiration(self):
         cache = LRUCache(default_ttl=0.1)  # 100ms TTL
         
-        cache.set("key1", "value1")
-        assert cache.get("key1") == "value1"
-        
-        time.sleep(0.15)  # Wait for expiration
-        assert cache.get("key1") is None
+        with patch("core.cache.time.monotonic") as monotonic:
+            monotonic.return_value = 1000.0
+            cache.set("key1", "value1")
+            assert cache.get("key1") == "value1"
+            
+            monotonic.return_value = 1000.15  # Past expiration
+            assert cache.get("key1") is None
     
     def test_access_order_update(self):
         cache = LRUCache(max_size=2)
@@ -93,6 +95,7 @@ class TestLRUCache:
         assert stats['size'] == 1
         assert stats['hit_rate'] == 0.5
 
+@pytest.mark.usefixtures("caches_reset")
 class TestCacheManager:
     """Test cache manager"""
     
@@ -142,6 +145,7 @@ class TestCacheManager:
         assert stats["cache1"]["size"] == 1
         assert stats["cache2"]["size"] == 1
 
+@pytest.mark.usefixtures("caches_reset")
 class TestCachedDecorator:
     """Test cached decorator"""
     
@@ -205,6 +209,7 @@ class TestMakeCacheKey:
         key2 = make_cache_key(b=2, a=1)
         assert key1 == key2  # Order shouldn't matter
 
+@pytest.mark.usefixtures("caches_reset")
 class TestQueryCache:
     """Test query cache functionality"""
     
@@ -241,6 +246,7 @@ class TestQueryCache:
         
         assert result == clients_data
 
+@pytest.mark.usefixtures("caches_reset")
 class TestSessionCache:
     """Test session cache functionality"""
     
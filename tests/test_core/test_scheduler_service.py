@@ -0,0 +1,161 @@
+"""
+Tests for the scheduler's per-user daily jobs
+"""
+import asyncio
+import threading
+import time
+import pytest
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from datetime import datetime, timedelta
+from services import scheduler_service as scheduler_module
+from services.database_service import db_service
+from models import User, Client, UserScheduleSettings, MessageTemplate, MessageLog, Subscription
+
+@pytest.fixture
+def scheduler():
+    scheduler = scheduler_module.SchedulerService()
+    yield scheduler
+    if scheduler._loop:
+        scheduler._loop.call_soon_threadsafe(scheduler._loop.stop)
+
+@pytest.fixture
+def clean_db():
+    """Empty the tables the scheduler touches after each test"""
+    yield
+    with db_service.get_session() as session:
+        for model in (MessageLog, MessageTemplate, Client, Subscription, UserScheduleSettings, User):
+            session.query(model).delete()
+
+def _add_user(session, user_id, due_in_days=1):
+    session.add(User(id=user_id, telegram_id=str(user_id)))
+    session.add(UserScheduleSettings(user_id=user_id, morning_reminder_time='00:00', daily_report_time='00:00'))
+    session.add(Client(
+        user_id=user_id, name=f'Cliente {user_id}', phone_number='11999990000', plan_price=10.0,
+        due_date=datetime.now(scheduler_module.ZoneInfo('America/Sao_Paulo')).date() + timedelta(days=due_in_days),
+    ))
+
+class TestRunJobsBlocking:
+    """Test per-job result collection"""
+
+    def test_finished_jobs_survive_tick_timeout(self, scheduler, monkeypatch):
+        monkeypatch.setattr(scheduler_module, '_TICK_JOBS_TIMEOUT', 0.3)
+
+        async def fast():
+            return True
+
+        async def slow():
+            await asyncio.sleep(5)
+            return True
+
+        async def failing():
+            raise RuntimeError("boom")
+
+        results = scheduler._run_jobs_blocking([fast(), slow(), failing()])
+
+        assert results[0] is True
+        assert isinstance(results[1], FuturesTimeoutError)
+        assert isinstance(results[2], RuntimeError)
+
+@pytest.mark.usefixtures("clean_db")
+class TestCheckReminderTimes:
+    """Test the daily done-flags written by each tick"""
+
+    def test_flags_written_for_finished_users_when_tick_times_out(self, scheduler, monkeypatch):
+        monkeypatch.setattr(scheduler_module, '_TICK_JOBS_TIMEOUT', 0.3)
+        with db_service.get_session() as session:
+            for user_id in (1, 2):
+                _add_user(session, user_id)
+            # Sem clientes na janela: marcado sem rodar corrotina
+            _add_user(session, 3, due_in_days=10)
+
+        async def job(user_id):
+            if user_id == 2:
+                await asyncio.sleep(5)
+            return True
+
+        monkeypatch.setattr(scheduler, '_process_daily_reminders_for_user', job)
+        monkeypatch.setattr(scheduler, '_process_user_notifications_for_user', job)
+
+        scheduler._check_reminder_times()
+
+        today = datetime.now(scheduler._tz).date()
+        with db_service.get_session() as session:
+            flags = dict(session.query(UserScheduleSettings.user_id, UserScheduleSettings.last_report_run))
+        assert flags == {1: today, 2: None, 3: today}
+        assert set(scheduler._last_morning_run) == {1, 3}
+
+class _BlockingWhatsApp:
+    """send_message_batch that blocks until released, counting calls"""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.calls = 0
+
+    def send_message_batch(self, user_id, items):
+        self.calls += 1
+        self.release.wait(5)
+        return [{'success': True} for _ in items]
+
+@pytest.mark.usefixtures("clean_db", "caches_reset")
+class TestDailyRemindersInFlight:
+    """Test that a batch outliving its job timeout is not sent twice"""
+
+    def test_timed_out_batch_is_not_resent(self, scheduler, monkeypatch):
+        monkeypatch.setattr(scheduler_module, '_USER_JOB_TIMEOUT', 0.3)
+        whatsapp = _BlockingWhatsApp()
+        monkeypatch.setattr(scheduler_module, 'whatsapp_service', whatsapp)
+        with db_service.get_session() as session:
+            _add_user(session, 1, due_in_days=1)
+            session.add(MessageTemplate(user_id=1, name='D-1', template_type='reminder_1_day', content='Oi {nome}'))
+
+        # Job times out while the shielded batch is still on the wire
+        first = scheduler._run_jobs_blocking([scheduler._process_daily_reminders_for_user(1)])
+        assert isinstance(first[0], TimeoutError)
+        assert 1 in scheduler._reminders_in_flight
+
+        # The next tick skips the user instead of sending the batch again
+        assert scheduler._run_jobs_blocking([scheduler._process_daily_reminders_for_user(1)]) == [False]
+        assert whatsapp.calls == 1
+
+        whatsapp.release.set()
+        deadline = time.monotonic() + 5
+        while scheduler._reminders_in_flight and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        with db_service.get_session() as session:
+            assert session.query(MessageLog.status).filter_by(user_id=1).all() == [('sent',)]
+
+        # Once logged, the dedup covers the day
+        assert scheduler._run_jobs_blocking([scheduler._process_daily_reminders_for_user(1)]) == [True]
+        assert whatsapp.calls == 1
+
+class _FakeTelegram:
+    async def send_notification(self, telegram_id, text):
+        return True
+
+@pytest.mark.usefixtures("clean_db")
+class TestCheckPendingPayments:
+    """Test that one failing status check does not undo the others"""
+
+    def test_failed_check_keeps_approvals_and_expiry(self, scheduler, monkeypatch):
+        def check_payment_status(payment_id):
+            if payment_id == 'boom':
+                raise RuntimeError("gateway down")
+            return {'success': True, 'status': 'approved'}
+
+        monkeypatch.setattr(scheduler_module.payment_service, 'check_payment_status', check_payment_status)
+        monkeypatch.setattr(scheduler_module, 'telegram_service', _FakeTelegram())
+        now = datetime.utcnow()
+        with db_service.get_session() as session:
+            session.add(User(id=1, telegram_id='1'))
+            session.add_all([
+                Subscription(id=1, user_id=1, amount=20.0, payment_id='boom', created_at=now),
+                Subscription(id=2, user_id=1, amount=20.0, payment_id='ok', created_at=now),
+                Subscription(id=3, user_id=1, amount=20.0, payment_id='old', created_at=now - timedelta(days=2)),
+            ])
+
+        scheduler._check_pending_payments()
+
+        with db_service.get_session() as session:
+            statuses = dict(session.query(Subscription.id, Subscription.status))
+        assert statuses == {1: 'pending', 2: 'approved', 3: 'expired'}
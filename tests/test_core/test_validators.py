@@ -2,11 +2,12 @@
 Tests for core validation system
 """
 import pytest
-from datetime import date, timedelta
+from datetime import date, datetime, timedelta
+from unittest.mock import patch
 from core.validators import (
     StringValidator, PhoneValidator, EmailValidator, 
     NumberValidator, DateValidator, ChoiceValidator,
-    ValidationSchema, CLIENT_SCHEMA, ValidationError
+    ValidationSchema, CLIENT_SCHEMA, ValidationError, _get_regex
 )
 
 class TestStringValidator:
@@ -38,6 +39,11 @@ class TestStringValidator:
         validator = StringValidator(sanitize_html=True)
         result = validator.validate("<script>alert('xss')</script>", "field")
         assert "&lt;script&gt;" in result
+    
+    def test_regex_cached(self):
+        assert _get_regex(r"^\d+$") is _get_regex(r"^\d+$")
+        validator = StringValidator(pattern=r"^\d+$")
+        assert validator.pattern is _get_regex(r"^\d+$")
 
 class TestPhoneValidator:
     """Test phone number validation"""
@@ -144,6 +150,35 @@ class TestDateValidator:
             validator.validate(date.today(), "date")
         assert "cannot be before" in str(exc.value)
     
+    def test_today_sentinel_resolved_once(self):
+        validator = DateValidator(min_date=DateValidator.TODAY)
+        assert validator.min_date == date.today()
+        
+        class ClockFreeDate(date):
+            @classmethod
+            def today(cls):
+                raise AssertionError("validate() read the clock")
+        
+        today, yesterday = date.today(), date.today() - timedelta(days=1)
+        with patch("core.validators.date", ClockFreeDate):
+            assert validator.validate(today, "date") == today
+            with pytest.raises(ValidationError):
+                validator.validate(yesterday, "date")
+    
+    @pytest.mark.parametrize("value, fmt", [
+        ("2024-01-05", "%Y-%m-%d"), ("2024-1-5", "%Y-%m-%d"), ("2024-01- 5", "%Y-%m-%d"),
+        ("05/01/2024", "%d/%m/%Y"), ("5/1/2024", "%d/%m/%Y"), (" 5/01/2024", "%d/%m/%Y"),
+    ])
+    def test_accepted_formats_match_strptime(self, value, fmt):
+        assert DateValidator().validate(value, "date") == datetime.strptime(value, fmt).date()
+    
+    @pytest.mark.parametrize("value", [
+        "2024- 1-05", "2024-01-  5", "2024-01-5 ", "05/ 1/2024", "  5/01/2024", "5/1/24",
+    ])
+    def test_rejected_formats_match_strptime(self, value):
+        with pytest.raises(ValidationError):
+            DateValidator().validate(value, "date")
+    
     def test_invalid_date_format(self):
         validator = DateValidator()
         with pytest.raises(ValidationError) as exc:
@@ -232,4 +267,80 @@ class TestClientSchema:
         }
         
         with pytest.raises(ValidationError):
-            CLIENT_SCHEMA.validate(data)
\ No newline at end of file
+            CLIENT_SCHEMA.validate(data)
+    
+    def test_client_schema_bulk(self):
+        rows = [
+            {
+                'name': f'Cliente {i}',
+                'phone_number': '11999999999',
+                'plan_name': 'Premium',
+                'plan_price': '50,00',
+                'due_date': date.today() + timedelta(days=30),
+            }
+            for i in range(1000)
+        ]
+        
+        result = CLIENT_SCHEMA.validate_many(rows)
+        
+        assert len(result) == len(rows)
+        assert result[999]['name'] == 'Cliente 999'
+        assert result[0]['plan_price'] == 50.0
+    
+    def test_validate_columns_numeric(self):
+        prices = [10.0 + (i % 500) for i in range(10000)]
+        
+        result = CLIENT_SCHEMA.validate_columns({'plan_price': prices})
+        
+        assert result['plan_price'] == prices
+    
+    def test_validate_columns_reports_row(self):
+        validator = NumberValidator(min_value=0)
+        assert validator.validate_column(["1,5", 2, 3.25], "price") == [1.5, 2.0, 3.25]
+        
+        with pytest.raises(ValidationError) as exc:
+            validator.validate_column([1, 2, -3, 4], "price")
+        assert "at least 0" in str(exc.value)
+        assert exc.value.context['row'] == 2
+    
+    def test_validate_column_rejects_nan(self):
+        validator = NumberValidator(min_value=0)
+        
+        # min() over [nan, -5.0] returns nan, which would hide the -5.0
+        with pytest.raises(ValidationError) as exc:
+            validator.validate_column([1.0, float('nan'), -5.0], "price")
+        assert "valid number" in str(exc.value)
+        assert exc.value.context['row'] == 1
+        
+        with pytest.raises(ValidationError):
+            validator.validate("nan", "price")
+    
+    def test_validate_column_decimal_places(self):
+        validator = NumberValidator(min_value=0.01, decimal_places=2)
+        assert validator.validate_column(["10,50", 3, 0.25], "price") == [10.5, 3.0, 0.25]
+        
+        with pytest.raises(ValidationError) as exc:
+            validator.validate_column([1.5, 2.25, 3.125], "price")
+        assert "2 decimal places" in str(exc.value)
+        assert exc.value.context['row'] == 2
+    
+    def test_schema_fields_are_read_only(self):
+        fields = {'name': StringValidator(min_length=2)}
+        schema = ValidationSchema(fields)
+        
+        # Changing the caller's dict does not reach the schema
+        fields['extra'] = StringValidator()
+        assert list(schema.fields) == ['name']
+        with pytest.raises(ValidationError):
+            schema.validate({'name': 'Ok', 'extra': 'x'})
+        
+        with pytest.raises(TypeError):
+            schema.fields['extra'] = StringValidator()
+    
+    def test_client_schema_bulk_reports_row(self):
+        rows = [{'name': 'Ok'}, {'name': 'A', 'extra': 1}]
+        
+        with pytest.raises(ValidationError) as exc:
+            ValidationSchema({'name': StringValidator(min_length=2)}).validate_many(rows)
+        assert exc.value.context['row'] == 1
+        assert exc.value.context['field_errors']['extra'] == "Unexpected field"
@@ -0,0 +1,27 @@
+"""
+Performance guard for the validation hot path
+
+Run with saved baselines to catch regressions, e.g.:
+    pytest tests/test_core/test_validators_perf.py --benchmark-autosave
+    pytest tests/test_core/test_validators_perf.py --benchmark-compare --benchmark-compare-fail=mean:20%
+"""
+import pytest
+from datetime import date, timedelta
+from core.validators import CLIENT_SCHEMA
+
+pytest.importorskip("pytest_benchmark")
+
+def test_client_schema_throughput(benchmark):
+    data = {
+        'name': 'João Silva',
+        'phone_number': '11999999999',
+        'plan_name': 'Premium',
+        'plan_price': 50.0,
+        'server_info': 'Server A',
+        'due_date': date.today() + timedelta(days=30),
+        'other_info': 'Additional info'
+    }
+    
+    result = benchmark(CLIENT_SCHEMA.validate, data)
+    
+    assert result['phone_number'] == '5511999999999'
@@ -0,0 +1,168 @@
+"""
+Tests for WhatsApp batch sending, the status cache and the restore throttle
+"""
+import threading
+import pytest
+import requests
+from unittest.mock import Mock, patch
+from services.whatsapp_service import WhatsAppService
+
+ITEMS = [
+    {'number': '(11) 98888-7777', 'message': 'Oi A'},
+    {'number': '11977776666', 'message': 'Oi B'},
+    {'number': '5511966665555', 'message': 'Oi C'},
+]
+
+@pytest.fixture
+def service():
+    service = WhatsAppService()
+    service._session = Mock(spec=requests.Session)
+    return service
+
+def _response(status_code, payload=None, text=''):
+    response = Mock(status_code=status_code, text=text)
+    response.json.return_value = payload
+    return response
+
+class TestSendMessageBatch:
+    """Test send_message_batch against a mocked HTTP session"""
+
+    def test_mixed_results_mapped_by_ref(self, service):
+        # Results arrive out of order; ref 2 is missing from the response
+        service._session.post.return_value = _response(200, {
+            'success': True,
+            'results': [
+                {'ref': 1, 'success': False, 'error': 'invalid number'},
+                {'ref': 0, 'success': True, 'messageId': 'm0'},
+                {'ref': 9, 'success': True, 'messageId': 'ignored'},
+            ],
+        })
+
+        results = service.send_message_batch(7, ITEMS)
+
+        url = service._session.post.call_args.args[0]
+        sent = service._session.post.call_args.kwargs['json']['messages']
+        assert url.endswith('/send-batch/7')
+        assert [m['ref'] for m in sent] == [0, 1, 2]
+        assert [m['number'] for m in sent] == ['5511988887777', '5511977776666', '5511966665555']
+
+        assert results[0] == {'success': True, 'message_id': 'm0', 'error': None}
+        assert results[1] == {'success': False, 'message_id': None, 'error': 'invalid number'}
+        assert results[2]['success'] is False
+        assert len(results) == 3
+
+    def test_404_falls_back_to_send_message(self, service):
+        service._session.post.return_value = _response(404, text='Not Found')
+
+        with patch.object(service, 'send_message', side_effect=lambda number, message, user_id: {
+            'success': True, 'message_id': message
+        }) as send_message:
+            results = service.send_message_batch(7, ITEMS)
+
+        assert [c.args for c in send_message.call_args_list] == [
+            (item['number'], item['message'], 7) for item in ITEMS
+        ]
+        assert [r['message_id'] for r in results] == ['Oi A', 'Oi B', 'Oi C']
+
+    def test_transport_error_fails_every_item(self, service):
+        service._session.post.side_effect = requests.exceptions.ConnectionError("refused")
+
+        results = service.send_message_batch(7, ITEMS)
+
+        assert len(results) == 3
+        assert all(r['success'] is False and r['error'] == 'Request failed' for r in results)
+        assert service._session.post.call_count == 1
+
+    def test_empty_batch_skips_request(self, service):
+        assert service.send_message_batch(7, []) == []
+        service._session.post.assert_not_called()
+
+STATUS_OK = {'connected': True, 'state': 'open'}
+
+class TestCheckInstanceStatus:
+    """Test the single-flight status cache"""
+
+    def test_concurrent_callers_share_one_request(self, service):
+        started, release = threading.Event(), threading.Event()
+
+        def get(url, timeout):
+            started.set()
+            release.wait(5)
+            return _response(200, STATUS_OK)
+
+        service._session.get.side_effect = get
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(service.check_instance_status(1)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        assert started.wait(5)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        assert service._session.get.call_count == 1
+        assert len(results) == 5 and all(r['connected'] for r in results)
+        # The per-user lock goes away with its last caller
+        assert service._status_locks == {}
+
+    def test_result_reused_within_ttl(self, service):
+        service._status_ttl = 60
+        service._session.get.return_value = _response(200, STATUS_OK)
+
+        service.check_instance_status(1)
+        service.check_instance_status(1)
+        assert service._session.get.call_count == 1
+
+        service._status_ttl = 0
+        service.check_instance_status(1)
+        assert service._session.get.call_count == 2
+
+    def test_failure_is_not_cached(self, service):
+        service._status_ttl = 60
+        service._session.get.return_value = _response(500, text='error')
+
+        assert service.check_instance_status(1)['success'] is False
+        service.check_instance_status(1)
+        assert service._session.get.call_count == 2
+
+    @pytest.mark.parametrize("action, args", [
+        ('restore_session', ()),
+        ('request_pairing_code', ('5511999999999',)),
+        ('disconnect_whatsapp', ()),
+        ('reconnect_whatsapp', ()),
+        ('force_new_qr', ()),
+    ])
+    def test_session_actions_invalidate_cache(self, service, action, args):
+        service._status_ttl = 60
+        service._session.get.return_value = _response(200, STATUS_OK)
+        service._session.post.return_value = _response(200, {'success': True})
+
+        service.check_instance_status(1)
+        service.check_instance_status(2)
+        getattr(service, action)(1, *args)
+        service.check_instance_status(1)
+        service.check_instance_status(2)
+
+        # Only the user the action touched is fetched again
+        assert [c.args[0].rsplit('/', 1)[1] for c in service._session.get.call_args_list] == ['1', '2', '1']
+
+class TestRestoreIfDue:
+    """Test the per-user restore throttle"""
+
+    def test_restore_once_per_ttl(self, service):
+        with patch.object(service, 'restore_session', return_value={'success': True}) as restore:
+            service._restore_if_due(1)
+            service._restore_if_due(1)
+            service._restore_if_due(2)
+
+        assert [c.args for c in restore.call_args_list] == [(1,), (2,)]
+
+    def test_failed_restore_can_retry(self, service):
+        with patch.object(service, 'restore_session', return_value={'success': False}) as restore:
+            service._restore_if_due(1)
+            service._restore_if_due(1)
+
+        assert restore.call_count == 2
@@ -2,8 +2,8 @@ import re
 import logging
 from datetime import datetime, date, timedelta
 from typing import Optional, Dict, Any
-import pytz
-from config import Config
+from zoneinfo import ZoneInfo
+from config import settings
 
 logger = logging.getLogger(__name__)
 
@@ -82,7 +82,7 @@ def get_timezone():
     """
     Get configured timezone
     """
-    return pytz.timezone(Config.TIMEZONE)
+    return ZoneInfo(settings.TIMEZONE)
 
 def get_local_time() -> datetime:
     """
@@ -200,7 +200,7 @@ def get_reminder_days() -> list[int]:
     """
     Get configured reminder days
     """
-    return Config.REMINDER_DAYS
+    return settings.REMINDER_DAYS
 
 def is_business_hour(hour: int = None) -> bool:
     """
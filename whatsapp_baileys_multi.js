@@ -790,6 +790,50 @@ app.post('/send/:userId', async (req, res) => {
     }
 });
 
+// Send several messages for one user in a single HTTP round trip.
+// Messages go out sequentially over the same socket; results keep request order.
+app.post('/send-batch/:userId', async (req, res) => {
+    try {
+        const userId = req.params.userId;
+        const messages = Array.isArray(req.body.messages) ? req.body.messages : [];
+
+        const session = userSessions.get(userId);
+
+        if (!session || !session.sock) {
+            const error = !session
+                ? 'Sessão não encontrada para este usuário'
+                : 'WhatsApp não conectado para este usuário';
+            return res.json({
+                success: false,
+                error,
+                results: messages.map(({ ref }) => ({ ref, success: false, error }))
+            });
+        }
+
+        const results = [];
+        for (const { number, message, ref } of messages) {
+            try {
+                const result = await session.sendMessage(number, message);
+                results.push({ ref, success: true, messageId: result.key.id });
+            } catch (error) {
+                results.push({ ref, success: false, error: error.message });
+            }
+        }
+
+        res.json({
+            success: true,
+            results
+        });
+
+    } catch (error) {
+        console.error('Erro ao enviar lote de mensagens:', error);
+        res.json({
+            success: false,
+            error: error.message
+        });
+    }
+});
+
 app.post('/disconnect/:userId', async (req, res) => {
     try {
         const userId = req.params.userId;